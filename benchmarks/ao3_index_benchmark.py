@@ -0,0 +1,103 @@
+"""
+Compare per-chapter lookups with single-pass indexing on AO3 full-work pages.
+
+The old extraction searched the whole document for div#chapter-<n> once per
+chapter, which is quadratic in the number of chapters; AO3.index_chapters
+selects every chapter in one pass. Full-work pages are read from cassettes
+recorded with benchmarks.replay_scrape, or generated with --synthetic:
+
+    python -m benchmarks.ao3_index_benchmark benchmarks/cassettes/ao3.zip
+    python -m benchmarks.ao3_index_benchmark --synthetic 500
+"""
+import argparse
+import json
+import time
+import zipfile
+
+from src.core.ao3 import AO3
+from src.core.parsers import available_backends, parse
+
+
+def lookup_chapters(doc):
+    """Extract chapters by searching for each chapter number in turn."""
+    chapters = []
+    chapter_number = 1
+    while True:
+        chapter = doc.select_one(f"div#chapter-{chapter_number}")
+        if not chapter:
+            return chapters
+        title_tag = chapter.select_one("h3.title")
+        title = title_tag.text(strip=True) if title_tag else f"Chapter {chapter_number}"
+        chapters.append((chapter_number, title, chapter.select_one("div.userstuff")))
+        chapter_number += 1
+
+
+def synthetic_work(chapters, paragraphs=30):
+    """Build a full-work page with the given number of chapters."""
+    body = "".join(
+        f'<div class="chapter" id="chapter-{n}"><div class="chapter preface group">'
+        f'<h3 class="title"><a href="/works/1/chapters/{n}">Chapter {n}</a>: Part {n}</h3></div>'
+        f'<div class="userstuff module" role="article">'
+        + "<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>" * paragraphs
+        + "</div></div>"
+        for n in range(1, chapters + 1)
+    )
+    return (
+        '<html><body><div class="preface group"><h2 class="title heading">Work</h2>'
+        '<h3 class="byline heading"><a rel="author" href="/users/a">Author</a></h3></div>'
+        f'<div id="chapters" role="article">{body}</div></body></html>'
+    ).encode()
+
+
+def load_works(paths):
+    """Read the full-work pages recorded in cassettes."""
+    works = []
+    for path in paths:
+        with zipfile.ZipFile(path) as archive:
+            index = json.loads(archive.read("index.json"))
+            for url, entry in index.items():
+                if "view_full_work=true" in url and entry["status"] == 200:
+                    works.append((url, archive.read(entry["body"])))
+    return works
+
+
+def best_of(repeat, func, *args):
+    """Return the fastest of several runs, in milliseconds, and the last result."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassettes", nargs="*", help="Cassette archives containing AO3 full-work pages")
+    parser.add_argument("--synthetic", type=int, help="Benchmark a generated work with this many chapters")
+    parser.add_argument("--backend", choices=available_backends(), help="Parser backend (default: configured)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+
+    works = load_works(args.cassettes)
+    if args.synthetic:
+        works.append((f"synthetic ({args.synthetic} chapters)", synthetic_work(args.synthetic)))
+    if not works:
+        parser.error("no full-work pages found; pass a cassette or --synthetic N")
+
+    print(f"{'work':<50}{'chapters':>9}{'parse':>12}{'lookup':>12}{'index':>12}{'speedup':>9}")
+    for name, page in works:
+        parse_ms, doc = best_of(args.repeat, parse, page, args.backend, AO3.WORK_TARGETS)
+        lookup_ms, looked_up = best_of(args.repeat, lookup_chapters, doc)
+        index_ms, indexed = best_of(args.repeat, AO3.index_chapters, doc)
+        if [c[:2] for c in looked_up] != [c[:2] for c in indexed]:
+            print(f"{name}: chapter lists differ ({len(looked_up)} vs {len(indexed)})")
+        print(
+            f"{name[-50:]:<50}{len(indexed):>9}{parse_ms:>9.1f} ms{lookup_ms:>9.1f} ms"
+            f"{index_ms:>9.1f} ms{lookup_ms / max(index_ms, 1e-6):>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
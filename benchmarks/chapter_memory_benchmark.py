@@ -0,0 +1,79 @@
+"""
+Measure the memory held by the chapters extracted from a large AO3 work.
+
+Three ways of extracting the same full-work page are compared with
+tracemalloc: keeping the content nodes of the parse tree as chapters used to,
+building Chapter records, and the streaming parser. "peak" is the highest
+allocation while extracting, "retained" what the chapter list still holds
+once extraction is over.
+
+    python -m benchmarks.chapter_memory_benchmark --synthetic 1000
+    python -m benchmarks.chapter_memory_benchmark benchmarks/cassettes/ao3.zip
+"""
+import argparse
+import gc
+import tracemalloc
+
+from benchmarks.ao3_index_benchmark import load_works, synthetic_work
+from src.core.ao3 import AO3
+from src.core.ao3_stream import WorkStreamParser
+from src.core.chapter import Chapter
+from src.core.parsers import available_backends, parse
+
+
+def node_chapters(page, backend):
+    """Keep the parse-tree nodes of each chapter."""
+    doc = parse(page, backend, AO3.WORK_TARGETS)
+    return [(str(num), title, content) for num, title, content in AO3.index_chapters(doc)]
+
+
+def record_chapters(page, backend):
+    """Serialize each chapter into a Chapter record and drop the tree."""
+    doc = parse(page, backend, AO3.WORK_TARGETS)
+    return [Chapter(num, title, content) for num, title, content in AO3.index_chapters(doc)]
+
+
+def stream_chapters(page, backend, chunk_size=65536):
+    """Feed the page to the streaming parser in network-sized chunks."""
+    parser = WorkStreamParser()
+    chapters = []
+    for start in range(0, len(page), chunk_size):
+        chapters.extend(Chapter(*chapter) for chapter in parser.feed_bytes(page[start:start + chunk_size]))
+    chapters.extend(Chapter(*chapter) for chapter in parser.finish())
+    return chapters
+
+
+def measure(func, page, backend):
+    """Return (peak MB, retained MB, chapter count) of one extraction."""
+    gc.collect()
+    tracemalloc.start()
+    chapters = func(page, backend)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6, retained / 1e6, len(chapters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassettes", nargs="*", help="Cassette archives containing AO3 full-work pages")
+    parser.add_argument("--synthetic", type=int, help="Benchmark a generated work with this many chapters")
+    parser.add_argument("--backend", choices=available_backends(), help="Parser backend (default: configured)")
+    args = parser.parse_args()
+
+    works = load_works(args.cassettes)
+    if args.synthetic:
+        works.append((f"synthetic ({args.synthetic} chapters)", synthetic_work(args.synthetic)))
+    if not works:
+        parser.error("no full-work pages found; pass a cassette or --synthetic N")
+
+    methods = {"tree nodes": node_chapters, "Chapter records": record_chapters, "streaming": stream_chapters}
+    for name, page in works:
+        print(f"{name[-60:]} ({len(page) / 1e6:.1f} MB)")
+        for label, func in methods.items():
+            peak, retained, count = measure(func, page, args.backend)
+            print(f"  {label:<16}{count:>6} chapters{peak:>10.1f} MB peak{retained:>10.1f} MB retained")
+
+
+if __name__ == "__main__":
+    main()
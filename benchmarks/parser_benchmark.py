@@ -0,0 +1,70 @@
+"""
+Compare parser backends on pages recorded in a cassette.
+
+Every recorded page from a supported site is parsed and its chapter content
+extracted with each available backend; the script prints the mean time per
+page for each site and backend. With --targeted only the extracted
+elements' subtrees are built, as the scrapers do.
+
+    python -m benchmarks.parser_benchmark benchmarks/cassettes/novelbin.zip --repeat 5 --targeted
+"""
+import argparse
+import json
+import time
+import zipfile
+from collections import defaultdict
+
+from src.core.engine import host_of
+from src.core.parsers import available_backends, parse
+
+# Selectors of the content each site scraper extracts from a page.
+EXTRACTORS = {
+    "novelbin.com": ("div#chr-content", "span.chr-text", "a#next_chap"),
+    "m.fanfiction.net": ("#storycontent",),
+    "www.fanfiction.net": ("#storytextp",),
+    "archiveofourown.org": ("h3.title", "div.userstuff"),
+}
+
+
+def extract(markup, backend, selectors, targeted=False):
+    """Parse a page and pull out the text and HTML of every selector."""
+    doc = parse(markup, backend, selectors if targeted else None)
+    for selector in selectors:
+        for node in doc.select(selector):
+            node.text(separator="\n")
+            node.html()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassettes", nargs="+", help="Cassette archives recorded with benchmarks.replay_scrape")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over every page per backend")
+    parser.add_argument("--targeted", action="store_true", help="Build only the extracted subtrees")
+    args = parser.parse_args()
+
+    pages = defaultdict(list)
+    for path in args.cassettes:
+        with zipfile.ZipFile(path) as archive:
+            index = json.loads(archive.read("index.json"))
+            for url, entry in index.items():
+                host = host_of(url)
+                if host in EXTRACTORS and entry["status"] == 200:
+                    pages[host].append(archive.read(entry["body"]))
+
+    backends = available_backends()
+    print(f"{'site':<22}{'pages':>7}{'MB':>8}" + "".join(f"{b:>14}" for b in backends))
+    for host, bodies in sorted(pages.items()):
+        size = sum(len(body) for body in bodies) / 1e6
+        timings = []
+        for backend in backends:
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                for body in bodies:
+                    extract(body, backend, EXTRACTORS[host], args.targeted)
+            elapsed = time.perf_counter() - started
+            timings.append(elapsed / (args.repeat * len(bodies)) * 1000)
+        print(f"{host:<22}{len(bodies):>7}{size:>8.1f}" + "".join(f"{t:>11.1f} ms" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark a full scrape against a recorded cassette.
+
+Record the traffic of a story once while online:
+
+    python -m benchmarks.replay_scrape record novelbin https://novelbin.com/b/some-novel
+
+Then replay it as often as needed without a network connection:
+
+    python -m benchmarks.replay_scrape replay novelbin https://novelbin.com/b/some-novel --latency 0.2 --error-rate 0.05
+"""
+import argparse
+import cProfile
+import pstats
+import time
+
+from src.core.ao3 import AO3
+from src.core.cassette import Cassette
+from src.core.fanficnet import FanfictionNet
+from src.core.novelbin import NovelBin
+
+SCRAPERS = {
+    "novelbin": NovelBin,
+    "fanficnet": FanfictionNet,
+    "ao3": AO3,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("site", choices=sorted(SCRAPERS))
+    parser.add_argument("target", help="NovelBin URL, or FanFiction.net / AO3 story ID")
+    parser.add_argument("--cassette", help="Archive path (default: benchmarks/cassettes/<site>.zip)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Synthetic latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum latency deviation in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profile", action="store_true", help="Print the top functions by cumulative time")
+    args = parser.parse_args()
+
+    cassette = Cassette(
+        args.cassette or f"benchmarks/cassettes/{args.site}.zip",
+        args.mode,
+        latency=args.latency,
+        latency_jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    scraper = SCRAPERS[args.site](cassette=cassette)
+    target = args.target if args.site == "novelbin" else int(args.target)
+
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    story = scraper.story(target)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - started
+    cassette.save()
+
+    chapters = len(story["chapters"]) if story else 0
+    print(f"{args.mode}: {chapters} chapters in {elapsed:.2f}s ({chapters / elapsed:.2f} chapters/s)")
+    print(f"Host rates: {scraper.engine.limiter.rates()}")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 """
 PostgreSQL Database Creation Script for Novel Web Scraper
-Creates a PostgreSQL database and user for the novel web scraper project.
+Creates a PostgreSQL database and user for the novel web scraper project,
+then applies the schema migrations in src/helpers/migrations.py.
 """
 
 import os
@@ -10,6 +11,8 @@ import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
 
+from src.helpers.migrations import SCHEMA_VERSION, migrate
+
 # Load environment variables from .env file if it exists
 load_dotenv()
 
@@ -32,164 +35,6 @@ def get_db_config():
     }
 
 
-def create_tables(cursor):
-    """
-    Create all necessary tables for the novel scraper project.
-    
-    Args:
-        cursor: PostgreSQL cursor object
-    """
-    
-    # Create ENUM types
-    cursor.execute("""
-        DO $$ BEGIN
-            CREATE TYPE source_type AS ENUM ('AO3', 'FanFictionNet', 'Kemono', 'NovelBin');
-        EXCEPTION WHEN duplicate_object THEN null;
-        END $$;
-    """)
-    
-    cursor.execute("""
-        DO $$ BEGIN
-            CREATE TYPE scrape_status AS ENUM ('pending', 'in_progress', 'completed', 'failed', 'paused');
-        EXCEPTION WHEN duplicate_object THEN null;
-        END $$;
-    """)
-    
-    # Create Sources table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sources (
-            id SERIAL PRIMARY KEY,
-            name source_type NOT NULL UNIQUE,
-            url VARCHAR(500) NOT NULL,
-            description TEXT,
-            active BOOLEAN DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
-    print("✓ Created 'sources' table")
-    
-    # Create Authors table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS authors (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(255) NOT NULL,
-            source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
-            source_author_id VARCHAR(255),
-            url VARCHAR(500),
-            bio TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(source_id, source_author_id)
-        );
-    """)
-    print("✓ Created 'authors' table")
-    
-    # Create Novels/Stories table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS novels (
-            id SERIAL PRIMARY KEY,
-            title VARCHAR(500) NOT NULL,
-            author_id INTEGER NOT NULL REFERENCES authors(id) ON DELETE CASCADE,
-            source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
-            source_novel_id VARCHAR(255),
-            description TEXT,
-            url VARCHAR(500),
-            status VARCHAR(50) DEFAULT 'ongoing',
-            rating DECIMAL(3, 2),
-            views INTEGER DEFAULT 0,
-            likes INTEGER DEFAULT 0,
-            language VARCHAR(50) DEFAULT 'English',
-            publication_date DATE,
-            last_updated DATE,
-            cover_url VARCHAR(500),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(source_id, source_novel_id)
-        );
-    """)
-    print("✓ Created 'novels' table")
-    
-    # Create Chapters table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS chapters (
-            id SERIAL PRIMARY KEY,
-            novel_id INTEGER NOT NULL REFERENCES novels(id) ON DELETE CASCADE,
-            chapter_number INTEGER NOT NULL,
-            title VARCHAR(500),
-            url VARCHAR(500),
-            content TEXT,
-            views INTEGER DEFAULT 0,
-            likes INTEGER DEFAULT 0,
-            published_date TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(novel_id)
-        );
-    """)
-    print("✓ Created 'chapters' table")
-    
-    # Create Categories/Tags table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tags (
-            id SERIAL PRIMARY KEY,
-            name VARCHAR(100) NOT NULL UNIQUE,
-            description TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
-    print("✓ Created 'tags' table")
-    
-    # Create Novel-Tags junction table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS novel_tags (
-            novel_id INTEGER NOT NULL REFERENCES novels(id) ON DELETE CASCADE,
-            tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
-            PRIMARY KEY (novel_id, tag_id)
-        );
-    """)
-    print("✓ Created 'novel_tags' table")
-    
-    # Create Scrape History/Logs table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS scrape_logs (
-            id SERIAL PRIMARY KEY,
-            source_id INTEGER NOT NULL REFERENCES sources(id) ON DELETE CASCADE,
-            novel_id INTEGER REFERENCES novels(id) ON DELETE SET NULL,
-            status scrape_status DEFAULT 'pending',
-            start_time TIMESTAMP,
-            end_time TIMESTAMP,
-            chapters_scraped INTEGER DEFAULT 0,
-            error_message TEXT,
-            success BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
-    print("✓ Created 'scrape_logs' table")
-    
-    # Create Favorites/Bookmarks table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS bookmarks (
-            id SERIAL PRIMARY KEY,
-            novel_id INTEGER NOT NULL REFERENCES novels(id) ON DELETE CASCADE,
-            bookmark_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            notes TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
-    print("✓ Created 'bookmarks' table")
-    
-    # Create Indexes for performance
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_novels_source_id ON novels(source_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_novels_author_id ON novels(author_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chapters_novel_id ON chapters(novel_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scrape_logs_source_id ON scrape_logs(source_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scrape_logs_novel_id ON scrape_logs(novel_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_novels_title ON novels(title);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_authors_name ON authors(name);")
-    print("✓ Created indexes")
-
-
 def create_database():
     """
     Create PostgreSQL database and user for the novel scraper project.
@@ -277,9 +122,9 @@ def create_database():
         cursor.close()
         conn.close()
         
-        # Connect to the new database to create tables
+        # Connect to the new database and bring its tables to the current schema
         print("\n" + "=" * 60)
-        print("Creating Tables...")
+        print("Migrating Tables...")
         print("=" * 60)
         
         conn = psycopg2.connect(
@@ -289,12 +134,10 @@ def create_database():
             password=config["db_password"],
             database=config["database"],
         )
-        conn.autocommit = True
-        cursor = conn.cursor()
         
-        create_tables(cursor)
+        applied = migrate(conn)
+        print(f"✓ Applied {len(applied)} migrations" if applied else "✓ Schema already up to date")
         
-        cursor.close()
         conn.close()
         
         print("\n" + "=" * 60)
@@ -307,15 +150,11 @@ def create_database():
         print(f"  User: {config['db_user']}")
         print("\nConnection String (for reference):")
         print(f"  postgresql://{config['db_user']}:{config['db_password']}@{config['host']}:{config['port']}/{config['database']}")
-        print("\nTables Created:")
-        print("  - sources (source types and URLs)")
-        print("  - authors (novel authors)")
-        print("  - novels (main stories/novels)")
-        print("  - chapters (individual chapters)")
-        print("  - tags (story categories/tags)")
-        print("  - novel_tags (novel-tag relationships)")
-        print("  - scrape_logs (scraping history)")
-        print("  - bookmarks (user bookmarks/favorites)")
+        print("\nTables:")
+        print("  - novel_novel (novels and their source IDs)")
+        print("  - novel_chapter (chapters, unique per novel and number)")
+        print("  - schema_migrations (applied schema versions)")
+        print(f"\nSchema version: {SCHEMA_VERSION}")
         
         return True
         
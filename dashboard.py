@@ -1,64 +1,70 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
-import os
-from dotenv import load_dotenv
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import numpy as np
 
-# Load environment variables
-load_dotenv()
+from src.helpers.connection import connection
+from src.helpers.migrations import SchemaOutdatedError, check_schema
 
-# Database connection
+# Database schema
 @st.cache_resource
-def get_db_connection():
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT"),
-    )
+def check_database():
+    """Checks once per server process that the database schema is up to date"""
+    check_schema()
+
+def prepare_database():
+    """Stops the app if the database needs migrating"""
+    try:
+        check_database()
+    except SchemaOutdatedError as e:
+        st.error(str(e))
+        st.stop()
 
 # Fetch data from database
 def fetch_novels_data():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, title, creator, date, status, views, description 
-        FROM novel_novel 
-        ORDER BY date DESC
-    """)
-    data = cursor.fetchall()
-    cursor.close()
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT id, title, creator, date, status, views, description 
+            FROM novel_novel 
+            ORDER BY date DESC
+        """)
+        data = cursor.fetchall()
     return pd.DataFrame(data, columns=['id', 'title', 'creator', 'date', 'status', 'views', 'description'])
 
 def fetch_chapters_data():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT nc.id, nc.novel_id, nc.title, nc.num, nc.date, nc.views, nn.title as novel_title
-        FROM novel_chapter nc
-        JOIN novel_novel nn ON nc.novel_id = nn.id
-        ORDER BY nc.date DESC
-    """)
-    data = cursor.fetchall()
-    cursor.close()
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT nc.id, nc.novel_id, nc.title, nc.num, nc.date, nc.views, nn.title as novel_title
+            FROM novel_chapter nc
+            JOIN novel_novel nn ON nc.novel_id = nn.id
+            ORDER BY nc.date DESC
+        """)
+        data = cursor.fetchall()
     return pd.DataFrame(data, columns=['id', 'novel_id', 'title', 'num', 'date', 'views', 'novel_title'])
 
+def fetch_novels_per_day():
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT date::date AS date_only, COUNT(*)
+            FROM novel_novel
+            WHERE date IS NOT NULL
+            GROUP BY date_only
+            ORDER BY date_only
+        """)
+        data = cursor.fetchall()
+    return pd.DataFrame(data, columns=['date_only', 'count'])
+
 def fetch_source_distribution():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT 
-            COUNT(CASE WHEN fanfic_id IS NOT NULL THEN 1 END) as fanficnet_count,
-            COUNT(CASE WHEN last_chapter_scraped IS NOT NULL AND fanfic_id IS NULL THEN 1 END) as novelbin_count
-        FROM novel_novel
-    """)
-    data = cursor.fetchone()
-    cursor.close()
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT 
+                COUNT(CASE WHEN fanfic_id IS NOT NULL THEN 1 END) as fanficnet_count,
+                COUNT(CASE WHEN last_chapter_scraped IS NOT NULL AND fanfic_id IS NULL THEN 1 END) as novelbin_count
+            FROM novel_novel
+        """)
+        data = cursor.fetchone()
     return data
 
 # Page configuration
@@ -73,6 +79,7 @@ st.sidebar.header("Dashboard Options")
 refresh_rate = st.sidebar.slider("Refresh rate (seconds)", 5, 300, 60)
 
 # Load data
+prepare_database()
 novels_df = fetch_novels_data()
 chapters_df = fetch_chapters_data()
 fanficnet_count, novelbin_count = fetch_source_distribution()
@@ -128,8 +135,7 @@ row2_col1, row2_col2 = st.columns(2)
 # Novels added over time
 with row2_col1:
     st.subheader("Novels Added Over Time")
-    novels_df['date_only'] = pd.to_datetime(novels_df['date'], format='%d %B %Y %H:%M').dt.date
-    novels_by_date = novels_df.groupby('date_only').size().reset_index(name='count')
+    novels_by_date = fetch_novels_per_day()
     fig = px.line(novels_by_date, x='date_only', y='count', markers=True,
                   title='Cumulative Novels')
     fig.update_xaxes(title_text="Date")
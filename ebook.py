@@ -76,35 +76,20 @@ def main():
     Main script to export novels and chapters from a PostgreSQL database
     into individual EPUB files.
     """
-    from dotenv import load_dotenv
-    import psycopg2
-    import os
-
-    load_dotenv()
-
-    psql = psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT"),
-    )
-    cursor = psql.cursor()
-    cursor.execute("SELECT id, title FROM novel_novel")
-    novels = cursor.fetchall()
-
-    for (id, novel_title) in novels:
-        cursor.execute(
-            "SELECT title, content FROM novel_chapter WHERE novel_id = %s ORDER BY num",
-            (id,)
-        )
-
-        chapters = cursor.fetchall()
-        create_epub(novel_title, chapters)
-
-
-    cursor.close()
-    psql.close()
+    from src.helpers.connection import connection
+
+    with connection() as psql, psql.cursor() as cursor:
+        cursor.execute("SELECT id, title FROM novel_novel")
+        novels = cursor.fetchall()
+
+        for (id, novel_title) in novels:
+            cursor.execute(
+                "SELECT title, content FROM novel_chapter WHERE novel_id = %s ORDER BY num",
+                (id,)
+            )
+
+            chapters = cursor.fetchall()
+            create_epub(novel_title, chapters)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
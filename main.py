@@ -1,14 +1,28 @@
+import sys
 
 #Local imports
 from src.core.novelbin import NovelBin
 from src.core.fanficnet import FanfictionNet
 from src.core.ao3 import AO3
+from src.core.sessions import get_session_pool
 #from src.core.kemono import Kemono
-from src.helpers.database_helpers import add_novel, add_chapter, close_db_connection, update_novel_last_chapter, update_novels, psql, cursor
+from src.helpers.database_helpers import add_novel, close_db_connection, add_chapters_bulk, update_novel_last_chapter, load_update_candidates
+from src.helpers.update_runner import UpdateRunner
+from src.helpers.connection import connection
+from src.helpers.migrations import SchemaOutdatedError, check_schema, migrate
 
 
 
 def main():
+    if sys.argv[1:] == ["migrate"]:
+        applied = migrate()
+        print(f"Applied migrations {applied}." if applied else "The database schema is up to date.")
+        return
+    try:
+        check_schema()
+    except SchemaOutdatedError as e:
+        print(e)
+        return
     while True:
         print("Choose Site to Scrape From:\n1. NovelBin\n2. FanFiction.net\n3. AO3\n4. Kemono\n5. Update\n6. Update fanfic metadata \n7. Exit")
         choice = input("Enter 1, 2, 3, 4 or 5: ").strip()
@@ -25,39 +39,43 @@ def main():
         elif choice == "4":
             return
         elif choice == "5":
-            c = input("1. Update from NovelBin last chapter scraped\n2. Update from FanFiction.net ID\n3. Update from AO3 ID\n4. Update all novels with status = FALSE\nChoose update method (1 or 2): ").strip()
-            if c == "1":
-                cursor.execute("SELECT title, id, fanfic_id, last_chapter_scraped, ao3_id FROM novel_novel WHERE last_chapter_scraped IS NOT NULL AND status = FALSE")
-                novels_to_update = [(t, i, f, l, a) for t, i, f, l, a in cursor.fetchall() if len(l) > 0]
-            elif c == "2":
-                cursor.execute("SELECT title, id, fanfic_id, last_chapter_scraped, ao3_id FROM novel_novel WHERE fanfic_id IS NOT NULL and status = FALSE")
-                novels_to_update = cursor.fetchall()
-            elif c == "3":
-                cursor.execute("SELECT title, id, fanfic_id, last_chapter_scraped, ao3_id FROM novel_novel WHERE ao3_id IS NOT NULL AND status = FALSE")
-                novels_to_update = cursor.fetchall()
-            elif c == "4":
-                cursor.execute("SELECT title, id, fanfic_id, last_chapter_scraped, ao3_id FROM novel_novel WHERE status = FALSE")
-                novels_to_update = cursor.fetchall()
-            else:
+            c = input("1. Update from NovelBin last chapter scraped\n2. Update from FanFiction.net ID\n3. Update from AO3 ID\n4. Update all novels with status = FALSE\n5. Check all novels with status = FALSE now, even if not due\nChoose update method (1 or 2): ").strip()
+            sources = {"1": "novelbin", "2": "fanficnet", "3": "ao3", "4": None, "5": None}
+            if c not in sources:
                 print("Invalid choice.")
                 continue
+            novels_to_update = load_update_candidates(sources[c], due_only=c != "5")
+            print(f"{len(novels_to_update)} novels are due for a check.")
+            if not novels_to_update:
+                continue
 
-            update_novels(novels_to_update, {"novelbin_instance": NovelBin(1), "fanficnet_instance": FanfictionNet(), "ao3_instance": AO3()})
+            scrapers = {"novelbin": lambda: NovelBin(1), "fanficnet": FanfictionNet, "ao3": AO3}
+            get_session_pool().warm([NovelBin.base_url, FanfictionNet.base_url, AO3.base_url])
+            results = list(UpdateRunner(scrapers).run(novels_to_update, sources[c]))
+            failed = [r for r in results if r["error"]]
+            unchanged = sum(r["unchanged"] for r in results)
+            print(f"Checked {len(results)} novels: {sum(r['inserted'] for r in results)} new chapters, {unchanged} unchanged on their source, {len(failed)} failed.")
+            for r in failed:
+                print(f"  {r['title']} (ID: {r['novel_id']}): {r['error']}")
+            for host, counts in get_session_pool().stats().items():
+                print(f"{host}: {counts['client']} client ({counts['plain']} plain, {counts['cloudscraper']} cloudscraper, {counts['escalated']} escalations)")
             continue
         elif choice == "6":
-            cursor.execute("SELECT id, title FROM novel_novel WHERE status = FALSE")
-            novels = cursor.fetchall()
-            for id, title in novels:
-                update = input(f"Mark '{title}' as completed? (y/n): ").strip().lower()
-                if update == 'y':
-                    cursor.execute("UPDATE novel_novel SET status = TRUE WHERE id = %s", (id,))
-                    psql.commit()
-                    print(f"'{title}' marked as completed.")
-                    continue
+            with connection() as psql, psql.cursor() as cursor:
+                cursor.execute("SELECT id, title FROM novel_novel WHERE status = FALSE")
+                novels = cursor.fetchall()
+                for id, title in novels:
+                    update = input(f"Mark '{title}' as completed? (y/n): ").strip().lower()
+                    if update == 'y':
+                        cursor.execute("UPDATE novel_novel SET status = TRUE WHERE id = %s", (id,))
+                        psql.commit()
+                        print(f"'{title}' marked as completed.")
+                        continue
 
         elif choice == "0":
-            cursor.execute("SELECT title, id, last_chapter_scraped FROM novel_novel WHERE last_chapter_scraped IS NOT NULL AND status = FALSE")
-            novels_to_update = [(t, i, l) for t, i, l in cursor.fetchall() if len(l) > 0]
+            with connection() as psql, psql.cursor() as cursor:
+                cursor.execute("SELECT title, id, last_chapter_scraped FROM novel_novel WHERE last_chapter_scraped IS NOT NULL AND status = FALSE")
+                novels_to_update = [(t, i, l) for t, i, l in cursor.fetchall() if len(l) > 0]
 
             for title, novel_id, last_chapter_scraped in novels_to_update:
                 up = input(f"Update last chapter scraped for '{title}({novel_id}): {last_chapter_scraped}'? (y/n): ").strip().lower()
@@ -77,26 +95,27 @@ def main():
         try:
             while True:
                 if url and choice == "1":
-                    story = scraper.story(url)
+                    story = scraper.iter_story(url)
                 else:
-                    story = scraper.story()
+                    story = scraper.iter_story()
 
                 if story is None:
                     print("Exiting the program.")
                     scraper.close()
                     return
 
-                metadata = story["metadata"]
-                chapters = story["chapters"]
-                last_chapter_href = story.get("last_chapter_scraped", None)
-                fanficnet_id = story.get("id", None)
-                ao3_id = story.get("id", None)
+                metadata = story.metadata
+                fanficnet_id = story.id if choice == "2" else None
+                ao3_id = story.id if choice == "3" else None
+                novelbin_slug = story.id if choice == "1" else None
                 
-                novel_id = add_novel(metadata, last_chapter_href, fanficnet_id, ao3_id)
+                novel_id = add_novel(metadata, None, fanficnet_id, ao3_id, novelbin_slug)
 
-                for chapter_num, chapter_title, content in chapters:        
-                    if novel_id:
-                        add_chapter(novel_id, chapter_title, chapter_num, content)
+                if novel_id:
+                    inserted, skipped = add_chapters_bulk(novel_id, story)
+                    print(f"Stored {inserted} chapters ({skipped} already stored).")
+                else:
+                    story.close()
 
                 print(f"Finished scraping and storing '{metadata['title']}'. Press Enter to continue or type 'back' to return to main menu.")
                 if input().strip().lower() == 'back':
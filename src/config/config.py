@@ -1,2 +1,161 @@
-import cloudscraper
+"""
+Runtime settings shared by the scrapers.
 
+Every value can be overridden from the environment (or the .env file) so
+nightly runs can be tuned without code changes.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Maximum number of requests in flight across all hosts.
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", "16"))
+
+# Maximum number of requests in flight against a single host.
+DEFAULT_HOST_CONCURRENCY = int(os.getenv("SCRAPER_HOST_CONCURRENCY", "2"))
+
+# Per-host overrides of DEFAULT_HOST_CONCURRENCY.
+HOST_CONCURRENCY = {
+    "novelbin.com": 4,
+    "m.fanfiction.net": 2,
+    "www.fanfiction.net": 2,
+    "archiveofourown.org": 2,
+}
+
+# Token bucket settings used when a host has no entry in HOST_RATE_POLICIES.
+# Rates are in requests per second; see src/core/rate_limiter.py.
+DEFAULT_RATE_POLICY = {
+    "rate": 0.5,
+    "min_rate": 0.05,
+    "max_rate": 2.0,
+    "burst": 1,
+    "increase": 0.05,
+    "decrease": 0.5,
+    "latency_factor": 2.0,
+    "latency_floor": 1.0,
+    "latency_window": 5,
+}
+
+# Per-host token bucket settings.
+HOST_RATE_POLICIES = {
+    "novelbin.com": {**DEFAULT_RATE_POLICY, "rate": 1.0, "max_rate": 4.0, "burst": 2},
+    "m.fanfiction.net": {**DEFAULT_RATE_POLICY, "rate": 0.5, "max_rate": 1.0},
+    "www.fanfiction.net": {**DEFAULT_RATE_POLICY, "rate": 0.5, "max_rate": 1.0},
+    "archiveofourown.org": {**DEFAULT_RATE_POLICY, "rate": 0.2, "min_rate": 0.02, "max_rate": 0.5},
+}
+
+# Directory of the on-disk response cache; leave unset to disable caching.
+CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR")
+
+# Upper bound for the compressed size of all cached response bodies.
+CACHE_MAX_BYTES = int(os.getenv("SCRAPER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Seconds a cached response is served without revalidation when its URL
+# matches none of CACHE_TTLS. Zero means always revalidate.
+CACHE_DEFAULT_TTL = 0
+
+# (regex, seconds) pairs checked in order against the URL; None disables
+# caching for matching URLs.
+CACHE_TTLS = [
+    (r"/search\?", None),
+    (r"fanfiction\.net/s/\d+/\d+", 24 * 60 * 60),
+    (r"archiveofourown\.org/works/\d+/chapters/\d+", 7 * 24 * 60 * 60),
+    (r"archiveofourown\.org/works/\d+\?.*view_full_work", 60 * 60),
+]
+
+# Connect and read timeouts for every request, in seconds.
+CONNECT_TIMEOUT = float(os.getenv("SCRAPER_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("SCRAPER_READ_TIMEOUT", "60"))
+
+# Retry policy for transient errors; see src/core/retry.py.
+RETRY_ATTEMPTS = int(os.getenv("SCRAPER_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 60.0
+RETRY_AFTER_MAX = 300.0
+
+# Consecutive transient failures that suspend a host, and for how long.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 120.0
+
+# Record/replay cassette; see src/core/cassette.py. Leave SCRAPER_CASSETTE
+# unset to talk to the live sites.
+CASSETTE_PATH = os.getenv("SCRAPER_CASSETTE")
+CASSETTE_MODE = os.getenv("SCRAPER_CASSETTE_MODE", "replay")
+CASSETTE_LATENCY = float(os.getenv("SCRAPER_CASSETTE_LATENCY", "0"))
+CASSETTE_LATENCY_JITTER = float(os.getenv("SCRAPER_CASSETTE_LATENCY_JITTER", "0"))
+CASSETTE_ERROR_RATE = float(os.getenv("SCRAPER_CASSETTE_ERROR_RATE", "0"))
+
+# Hosts that must always use a given HTTP client ("plain" or "cloudscraper").
+# Other hosts start on the plain client and are switched to cloudscraper
+# when a challenge page is detected; see src/core/sessions.py.
+HOST_CLIENTS = {}
+
+# User agent sent by the plain client.
+PLAIN_USER_AGENT = os.getenv(
+    "SCRAPER_USER_AGENT",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+)
+
+# Where the chosen client, clearance cookies and user agents are kept
+# between runs.
+SESSION_STATE_PATH = os.getenv(
+    "SCRAPER_SESSION_STATE",
+    os.path.join(os.path.expanduser("~"), ".cache", "novel-webscraper", "sessions.json"),
+)
+
+# HTML parser backend: "auto" (lxml when installed, else html.parser),
+# "html.parser", "lxml" or "selectolax"; see src/core/parsers.py.
+PARSER_BACKEND = os.getenv("SCRAPER_PARSER", "auto")
+
+# Worker processes that parse pages (0 parses in-process) and the number of
+# pages allowed in flight between fetching and parsing; see
+# src/core/pipeline.py.
+PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_WINDOW = int(os.getenv("SCRAPER_PARSE_WINDOW", "16"))
+# Single pages up to this size, in bytes, are parsed in the calling thread;
+# sending them to a worker process costs more than parsing them.
+PARSE_INLINE_BYTES = int(os.getenv("SCRAPER_PARSE_INLINE_BYTES", "131072"))
+
+# Size of the chunks read from streamed responses, in bytes.
+STREAM_CHUNK_SIZE = int(os.getenv("SCRAPER_STREAM_CHUNK_SIZE", "65536"))
+
+# Estimated size of AO3 page chrome and of an average chapter, in bytes.
+# An AO3 update downloads the full work instead of the missing chapters'
+# pages when that is estimated to transfer fewer bytes; see src/core/ao3.py.
+AO3_PAGE_BYTES = int(os.getenv("SCRAPER_AO3_PAGE_BYTES", "40000"))
+AO3_CHAPTER_BYTES = int(os.getenv("SCRAPER_AO3_CHAPTER_BYTES", "30000"))
+
+# Extract AO3 full-work pages with the streaming parser as they download
+# instead of parsing the whole page at once; see src/core/ao3_stream.py.
+AO3_STREAM = os.getenv("SCRAPER_AO3_STREAM", "0").lower() in ("1", "true", "yes")
+
+# Chapters written to the database per batch while a story is scraped; the
+# novel's resume point is saved after each batch.
+CHAPTER_BATCH_SIZE = int(os.getenv("SCRAPER_CHAPTER_BATCH_SIZE", "50"))
+
+# Size of the PostgreSQL connection pool, and how long an idle pooled
+# connection may go unused before it is checked with SELECT 1 on checkout,
+# in seconds; see src/helpers/connection.py.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "30"))
+
+# Rows rewritten per transaction by the batched schema migrations; see
+# src/helpers/migrations.py.
+MIGRATION_BATCH_SIZE = int(os.getenv("DB_MIGRATION_BATCH_SIZE", "5000"))
+
+# Novels checked for new chapters at once by an update run, and at most how
+# many of them may be on the same source; see src/helpers/update_runner.py.
+UPDATE_WORKERS = int(os.getenv("SCRAPER_UPDATE_WORKERS", "6"))
+UPDATE_HOST_WORKERS = int(os.getenv("SCRAPER_UPDATE_HOST_WORKERS", "2"))
+
+# Adaptive update schedule: how often a novel is checked for new chapters
+# is learned from how often it has new ones, between these bounds. A check
+# that finds nothing multiplies the interval by UPDATE_BACKOFF, and a failed
+# check is retried after the shortest interval; see src/helpers/scheduler.py.
+UPDATE_MIN_INTERVAL_HOURS = float(os.getenv("SCRAPER_UPDATE_MIN_INTERVAL_HOURS", "6"))
+UPDATE_MAX_INTERVAL_HOURS = float(os.getenv("SCRAPER_UPDATE_MAX_INTERVAL_HOURS", "720"))
+UPDATE_BACKOFF = float(os.getenv("SCRAPER_UPDATE_BACKOFF", "2"))
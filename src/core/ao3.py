@@ -1,6 +1,11 @@
+from urllib.parse import urlparse
+
+from ..config.config import AO3_CHAPTER_BYTES, AO3_PAGE_BYTES, AO3_STREAM
+from .ao3_stream import WorkStreamParser
+from .chapter import Chapter
+from .parsers import parse
 from .scraper import Scraper
-from bs4 import BeautifulSoup
-from time import sleep
+from .story import StoryStream
 
 class AO3(Scraper):
     """
@@ -8,47 +13,110 @@ class AO3(Scraper):
     
     Inherits from Scraper and provides methods to fetch story metadata
     and chapter content from archiveofourown.org.
+
+    New stories are read from the full-work page. Updates look the chapters
+    up in the work's chapter index and fetch only the missing ones, unless
+    downloading the full work is estimated to be cheaper.
+
+    Attributes:
+        stream (bool): Extract full-work pages with the streaming parser while
+            they download, keeping memory flat for very long works.
+        probed (tuple): The work ID, chapter index and fingerprint read by the
+            last fingerprint() call, until iter_updates uses them.
     """
-    def __init__(self):
-        """Initialize AO3 scraper with base URL."""
-        super().__init__()
-        self.base_url = "https://archiveofourown.org"
+    base_url = "https://archiveofourown.org"
+
+    # Elements read from the full-work page and from a single chapter page.
+    WORK_TARGETS = ("h2.title", "h3.byline", "div.summary", "div#chapters")
+    CHAPTER_TARGETS = ("h3.title", "div.userstuff", "li.next")
+    INDEX_TARGETS = ("ol.index",)
+
+    def __init__(self, stream=AO3_STREAM, **kwargs):
+        """Initialize AO3 scraper."""
+        super().__init__(**kwargs)
+        self.stream = stream
+        self.probed = None
     
-    def metadata(self, story_id, html=False):
+    def metadata(self, story_id, with_chapters=False):
         """
         Extract metadata for a story from AO3.
         
         Args:
             story_id (str): The story ID on AO3.
+            with_chapters (bool): Also return the chapters of the full-work page.
+
+        Returns:
+            dict | tuple: The metadata, or (metadata, chapters) when
+                with_chapters is set. In streaming mode chapters is an
+                iterator that downloads the rest of the page as it is consumed.
         """
-        url = f"{self.base_url}/works/{story_id}?view_adult=true&amp;view_full_work=true"
+        url = f"{self.base_url}/works/{story_id}?view_adult=true&view_full_work=true"
+        if self.stream:
+            metadata, chapters = self.stream_work(url, with_chapters)
+            if with_chapters:
+                return metadata, chapters
+            return metadata
 
         response = self.retry_fetch(url)
-        soup = BeautifulSoup(response, self.parser)
-        title = soup.find("h2", class_="title heading").get_text(strip=True)
-        author = soup.find("a", rel="author").get_text(strip=True)
-        description = soup.find("div", class_="summary module")
-        
-        
-        metadata = {
-            "title": title,
-            "author": author,
-            "description": str(description),
-            "img_url": None,
-        }
-        if html:
-            return metadata, soup
+        metadata, chapters = self.extract(extract_work, response)
+        if with_chapters:
+            return metadata, chapters
         return metadata
 
-    def story(self, story_id=None):
+    def stream_work(self, url, with_chapters=True):
+        """
+        Extract a full-work page incrementally while it downloads.
+
+        The page is read until the chapters begin, which is enough for the
+        metadata; each chapter is then emitted as soon as it has been
+        received, and no parse tree of the page is ever built.
+
+        Args:
+            url (str): The full-work URL.
+            with_chapters (bool): Keep the download open for the chapters.
+                When False, the response is closed once the metadata has
+                been read.
+
+        Returns:
+            tuple: (metadata dict, iterator of (chapter_number, title,
+                content HTML) tuples, or None without with_chapters).
+
+        Raises:
+            ValueError: If the page has no work title.
+        """
+        chunks = self.fetch_stream(url)
+        parser = WorkStreamParser()
+        ready = []
+        for chunk in chunks:
+            ready.extend(parser.feed_bytes(chunk))
+            if parser.metadata_done:
+                break
+        if parser.metadata["title"] is None:
+            chunks.close()
+            raise ValueError("Work not found")
+        if not with_chapters:
+            chunks.close()
+            return parser.metadata, None
+
+        def chapters():
+            try:
+                yield from ready
+                for chunk in chunks:
+                    yield from parser.feed_bytes(chunk)
+                yield from parser.finish()
+            finally:
+                chunks.close()
+        return parser.metadata, chapters()
+
+    def iter_story(self, story_id=None):
         """
-        Fetch an entire story including metadata and all chapters.
+        Start scraping a story; chapters are yielded as they are extracted.
         
-        Prompts user for story ID and fetches all available chapters
-        with retry logic.
+        Prompts user for story ID when none is given.
         
         Returns:
-            dict: Dictionary with 'metadata', 'chapters' and 'last_chapter_scraped' keys.
+            StoryStream: The story, or None if the user exits or the work
+                cannot be fetched.
         """
         if story_id is None:
             story_id = input(
@@ -57,44 +125,151 @@ class AO3(Scraper):
             if story_id.lower() == 'exit':
                 return None
         try:
-            metadata, soup = self.metadata(story_id, html=True)
+            metadata, work_chapters = self.metadata(story_id, with_chapters=True)
         except Exception as e:
             print(f"Error fetching metadata: {e}")
             return None
         
-        chapters = []
-        chapter_number = 1
+        return StoryStream(
+            metadata, self.work_chapters(work_chapters, 0, "Scraping completed."), id=story_id
+        )
 
-        
-        while True:
+    def work_chapters(self, work_chapters, last_chapter_number, done):
+        """
+        Turn the chapters extracted from a full-work page into Chapter records.
+
+        Args:
+            work_chapters (iterable): (chapter_number, title, content) tuples.
+            last_chapter_number (int): Chapters up to this number are skipped.
+            done (str): Message printed when the chapters run out.
+
+        Yields:
+            Chapter: The chapters after last_chapter_number.
+        """
+        for chapter_number, title, content in work_chapters:
+            if chapter_number <= last_chapter_number:
+                continue
+            print(f"Fetched chapter {chapter_number}: {title}")
+            yield Chapter(chapter_number, title, content)
+        print(done)
+    
+    @staticmethod
+    def index_chapters(doc, work_title=None):
+        """
+        Collect every chapter of a parsed full-work page in one pass.
+
+        The chapter elements are selected once and each one is only searched
+        within its own subtree, instead of rescanning the whole document for
+        every chapter number.
+
+        Args:
+            doc (Node): The parsed full-work page.
+            work_title (str, optional): Title used for a single-chapter work,
+                whose page has no chapter headings.
+
+        Returns:
+            list: (chapter_number, title, content) tuples ordered by number.
+        """
+        chapters = {}
+        for chapter in doc.select("div#chapters > div.chapter"):
+            chapter_id = chapter.attr("id") or ""
+            if not chapter_id.startswith("chapter-"):
+                continue
             try:
-                chapter_number, title, content = self.get_chapter(soup, chapter_number)
-                print(f"Fetched chapter {chapter_number}: {title}")
-                chapters.append((str(chapter_number), title, content))
+                chapter_number = int(chapter_id[len("chapter-"):])
             except ValueError:
-                break
+                continue
+            content = chapter.select_one("div.userstuff")
+            if content is None:
+                continue
+            title_tag = chapter.select_one("h3.title")
+            title = title_tag.text(strip=True) if title_tag else f"Chapter {chapter_number}"
+            chapters[chapter_number] = (chapter_number, title, content)
 
-        print("Scraping completed.")
-        
-        return {"metadata": metadata, "chapters": chapters, "id": story_id}
-    
-    def get_chapter(self, soup, chapter_number):
+        if not chapters:
+            content = doc.select_one("div#chapters > div.userstuff")
+            if content is not None:
+                chapters[1] = (1, work_title or "Chapter 1", content)
+        return [chapters[number] for number in sorted(chapters)]
+
+    def chapter_index(self, story_id):
         """
-        Fetch a specific chapter from a story soup.
-        
+        Fetch the URLs of a work's chapters from its chapter index.
+
         Args:
-            soup (BeautifulSoup): The BeautifulSoup object of the story page.
-            chapter_number (int): The chapter number to fetch.
+            story_id (str): The story ID on AO3.
+
         Returns:
-            tuple: A tuple containing (chapter_number, title, content).
+            list: Chapter page URLs in order (chapter n at position n - 1),
+                or None if the index is unavailable.
         """
-        chapter = soup.find("div", id=f"chapter-{chapter_number}")
-        if not chapter:
-            raise ValueError("Chapter not found")
-        title_tag = chapter.find("h3", class_="title")
-        title = title_tag.get_text(strip=True) if title_tag else f"Chapter {chapter_number}"
-        content = chapter.find("div", class_="userstuff")
-        return chapter_number + 1, title, content
+        url = f"{self.base_url}/works/{story_id}/navigate?view_adult=true"
+        try:
+            page = self.retry_fetch(url)
+        except Exception as e:
+            print(f"Chapter index unavailable for work {story_id}: {e}")
+            return None
+        doc = self.parse(page, self.INDEX_TARGETS, required=("ol.index",))
+        links = doc.select("ol.index li a[href]")
+        return [f"{self.base_url}{link['href']}?view_adult=true" for link in links] or None
+
+    def fingerprint(self, story_id):
+        """
+        Read a work's chapter count and last chapter from its chapter index.
+
+        Args:
+            story_id (str): The story ID on AO3.
+
+        Returns:
+            str: The chapter count and last chapter path, or None if the
+                index is unavailable.
+        """
+        index = self.chapter_index(story_id)
+        if index is None:
+            return None
+        fingerprint = f"{len(index)}:{urlparse(index[-1]).path}"
+        self.probed = (story_id, index, fingerprint)
+        return fingerprint
+
+    def prefer_full_work(self, missing, total):
+        """
+        Tell whether downloading the full work is cheaper than the missing chapters.
+
+        Args:
+            missing (int): Number of chapters to fetch.
+            total (int): Number of chapters in the work.
+
+        Returns:
+            bool: True if the full-work page is estimated to be smaller than
+                the missing chapters' pages together.
+        """
+        selective = missing * (AO3_PAGE_BYTES + AO3_CHAPTER_BYTES)
+        full = AO3_PAGE_BYTES + total * AO3_CHAPTER_BYTES
+        return full <= selective
+
+    def download(self, urls, chapter_number):
+        """
+        Fetch single chapter pages concurrently within the rate limit.
+
+        Downloading stops at the first chapter that fails, so the result
+        never has gaps.
+
+        Args:
+            urls (list): Chapter page URLs in order.
+            chapter_number (int): The number of the chapter before the first URL.
+
+        Yields:
+            Chapter: The fetched chapters.
+        """
+        for url, result in self.fetch_extract_many(urls, extract_chapter):
+            if isinstance(result, Exception):
+                print(f"Failed to fetch {url}: {result}")
+                return
+            chapter_number += 1
+            title, content = result
+            title = title or f"Chapter {chapter_number}"
+            print(f"Fetched chapter {chapter_number}: {title}")
+            yield Chapter(chapter_number, title, content)
 
     def chapter(self, url, chapter_number):
         """
@@ -105,37 +280,132 @@ class AO3(Scraper):
             chapter_number (int): The chapter number to fetch.
 
         Returns:
-            tuple: A tuple containing (next_chapter_href, chapter_number, title, content).
+            tuple: A tuple containing (next_chapter_href, chapter_number, title,
+                content HTML).
         """
         response = self.retry_fetch(url)
-        soup = BeautifulSoup(response, self.parser)
-        title = soup.find("h3", class_="title").get_text(strip=True)
-        content = soup.find("div", class_="userstuff")
-        next_chapter = soup.find("li", class_="next")
-        next_chapter_href = f"{self.base_url}{next_chapter.find('a')['href']}" if next_chapter and next_chapter.find('a') else None
+        doc = self.parse(response, self.CHAPTER_TARGETS, required=("div.userstuff",))
+        title = doc.select_one("h3.title").text(strip=True)
+        content = doc.select_one("div.userstuff")
+        next_chapter = doc.select_one("li.next a")
+        next_chapter_href = f"{self.base_url}{next_chapter['href']}" if next_chapter else None
         if content is None:
             raise ValueError("Chapter not found")
-        return next_chapter_href, chapter_number + 1, title, content
+        return next_chapter_href, chapter_number + 1, title, str(content)
 
     def update(self, story_id, last_chapter_number):
         """
         Fetch new chapters from a story starting after the last scraped chapter.
+
+        Args:
+            story_id (str): The story ID on AO3.
+            last_chapter_number (int): The last chapter number that was scraped.
+
+        Returns:
+            tuple: List of Chapter records for new chapters, and the story ID.
         """
-        try:
-            _, soup = self.metadata(story_id, html=True)
-        except Exception as e:
-            print(f"Error fetching metadata: {e}")
-            return None
-        
-        chapters = []
-        last_chapter_number += 1
-        while True:
-            try:
-                last_chapter_number, title, content = self.get_chapter(soup, last_chapter_number)
-                print(f"Fetched chapter {last_chapter_number}: {title}")
-                chapters.append((str(last_chapter_number), title, content))
-            except ValueError:
-                break
+        return list(self.iter_updates(story_id, last_chapter_number)), story_id
 
-        print("Update completed.")
-        return chapters
\ No newline at end of file
+    def iter_updates(self, story_id, last_chapter_number):
+        """
+        Start fetching the chapters added since the last scrape, lazily.
+
+        The chapter index read by fingerprint() just before is reused.
+
+        Args:
+            story_id (str): The story ID on AO3.
+            last_chapter_number (int): The last chapter number that was scraped.
+
+        Returns:
+            StoryStream: The new chapters; metadata is only set when the
+                full work was downloaded.
+
+        Raises:
+            Exception: If the full work cannot be fetched, so that the
+                check is recorded as failed.
+        """
+        probed, self.probed = self.probed, None
+        if probed is not None and probed[0] == story_id:
+            index, fingerprint = probed[1:]
+        else:
+            index, fingerprint = self.chapter_index(story_id), None
+        expected = None
+        if index is not None:
+            missing = index[last_chapter_number:]
+            expected = len(missing)
+            if not missing:
+                print(f"No new chapters for work {story_id} ({len(index)} chapters).")
+                return StoryStream(id=story_id, fingerprint=fingerprint, expected=0)
+            if not self.prefer_full_work(len(missing), len(index)):
+                return StoryStream(
+                    chapters=self.download(missing, last_chapter_number), id=story_id,
+                    fingerprint=fingerprint, expected=expected,
+                )
+
+        metadata, work_chapters = self.metadata(story_id, with_chapters=True)
+        return StoryStream(
+            metadata,
+            self.work_chapters(work_chapters, last_chapter_number, "Update completed."),
+            id=story_id,
+            fingerprint=fingerprint,
+            expected=expected,
+        )
+
+
+def extract_work(page, parser):
+    """
+    Extract the metadata and every chapter from an AO3 full-work page.
+
+    Runs in a parse worker process, so it takes and returns only picklable
+    values.
+
+    Args:
+        page (bytes): The raw full-work page.
+        parser (str): The parser backend.
+
+    Returns:
+        tuple: (metadata dict, list of (chapter_number, title, content HTML)).
+    """
+    doc = parse(page, parser, AO3.WORK_TARGETS, required=("h2.title.heading",))
+    title = doc.select_one("h2.title.heading").text(strip=True)
+    author = doc.select_one('a[rel="author"]').text(strip=True)
+    description = doc.select_one("div.summary.module")
+
+    metadata = {
+        "title": title,
+        "author": author,
+        "description": str(description),
+        "img_url": None,
+    }
+
+    chapters = [
+        (chapter_number, chapter_title, str(content))
+        for chapter_number, chapter_title, content in AO3.index_chapters(doc, title)
+    ]
+    return metadata, chapters
+
+
+def extract_chapter(page, parser):
+    """
+    Extract the title and content from a single AO3 chapter page.
+
+    Runs in a parse worker process, so it takes and returns only picklable
+    values.
+
+    Args:
+        page (bytes): The raw chapter page.
+        parser (str): The parser backend.
+
+    Returns:
+        tuple: (title, content HTML).
+
+    Raises:
+        ValueError: If the chapter content cannot be found.
+    """
+    doc = parse(page, parser, AO3.CHAPTER_TARGETS, required=("div.userstuff",))
+    content = doc.select_one("div.userstuff")
+    if content is None:
+        raise ValueError("Chapter not found")
+    title_tag = doc.select_one("h3.title")
+    title = title_tag.text(strip=True) if title_tag else None
+    return title, str(content)
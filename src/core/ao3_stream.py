@@ -0,0 +1,225 @@
+"""
+Event-based extraction of AO3 full-work pages.
+
+WorkStreamParser is fed the page in chunks, as they arrive from the network,
+and hands out each chapter as soon as its div#chapter-N element closes. Only
+the markup of the elements being extracted is kept, so memory use does not
+grow with the length of the work.
+"""
+import codecs
+from html import unescape
+from html.parser import HTMLParser
+
+# Elements that never have an end tag.
+VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+))
+
+
+class Capture:
+    """
+    Markup or text collected from one element and its descendants.
+
+    Attributes:
+        name (str): What is being captured, e.g. 'title' or 'content'.
+        depth (int): Length of the open-element stack inside the element.
+        html (list): Raw markup fragments, or None when only text is kept.
+        text (list): Stripped text nodes.
+    """
+    __slots__ = ("name", "depth", "html", "text", "_pending")
+
+    def __init__(self, name, depth, start_tag=None):
+        """Start capturing; start_tag is the element's raw start tag for HTML captures."""
+        self.name = name
+        self.depth = depth
+        self.html = [start_tag] if start_tag is not None else None
+        self.text = []
+        self._pending = []
+
+    def markup(self, fragment):
+        """Add raw markup that is not text."""
+        self.flush()
+        if self.html is not None:
+            self.html.append(fragment)
+
+    def data(self, fragment):
+        """Add raw character data, entity references included."""
+        self._pending.append(fragment)
+        if self.html is not None:
+            self.html.append(fragment)
+
+    def flush(self):
+        """Close the current text node."""
+        if self._pending:
+            text = unescape("".join(self._pending)).strip()
+            if text:
+                self.text.append(text)
+            self._pending = []
+
+    def value(self):
+        """Return the captured text, or markup for HTML captures."""
+        self.flush()
+        if self.html is not None:
+            return "".join(self.html)
+        return "".join(self.text)
+
+
+class WorkStreamParser(HTMLParser):
+    """
+    Incremental parser for AO3 full-work pages.
+
+    Attributes:
+        metadata (dict): Title, author, description and image URL, filled in
+            as the work's preface is parsed.
+        metadata_done (bool): True once the chapters have started, after
+            which metadata no longer changes.
+    """
+    def __init__(self, encoding="utf-8"):
+        """Initialize the parser."""
+        super().__init__(convert_charrefs=False)
+        self.metadata = {"title": None, "author": None, "description": "None", "img_url": None}
+        self.metadata_done = False
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._stack = []
+        self._captures = []
+        self._chapters_depth = None
+        self._chapter = None
+        self._ready = []
+
+    def feed_bytes(self, chunk):
+        """
+        Parse the next chunk of the page.
+
+        Args:
+            chunk (bytes): Raw bytes in document order.
+
+        Returns:
+            list: (chapter_number, title, content HTML) tuples completed by
+                this chunk.
+        """
+        self.feed(self._decoder.decode(chunk))
+        return self._take()
+
+    def finish(self):
+        """
+        Flush the parser at the end of the page.
+
+        Returns:
+            list: Any chapters completed by the remaining input.
+        """
+        self.feed(self._decoder.decode(b"", final=True))
+        self.close()
+        return self._take()
+
+    def _take(self):
+        """Return and forget the chapters completed so far."""
+        ready, self._ready = self._ready, []
+        return ready
+
+    def _capture(self, name, html):
+        """Start capturing the element whose start tag was just pushed."""
+        start_tag = self.get_starttag_text() if html else None
+        self._captures.append(Capture(name, len(self._stack), start_tag))
+
+    @staticmethod
+    def _new_chapter(number, depth, single):
+        """Return the state of a chapter element that just opened."""
+        return {"number": number, "depth": depth, "single": single, "title": None, "content": None}
+
+    def handle_starttag(self, tag, attrs):
+        raw = self.get_starttag_text()
+        for capture in self._captures:
+            capture.markup(raw)
+        if tag in VOID_ELEMENTS:
+            return
+        self._stack.append(tag)
+
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        element_id = attrs.get("id") or ""
+        depth = len(self._stack)
+
+        if self._chapters_depth is None:
+            if tag == "div" and element_id == "chapters":
+                self._chapters_depth = depth
+                self.metadata_done = True
+            elif tag == "h2" and "title" in classes and self.metadata["title"] is None:
+                self._capture("work_title", html=False)
+            elif tag == "a" and attrs.get("rel") == "author" and self.metadata["author"] is None:
+                self._capture("author", html=False)
+            elif tag == "div" and "summary" in classes and "module" in classes:
+                self._capture("description", html=True)
+            return
+
+        if self._chapter is None:
+            if tag == "div" and element_id.startswith("chapter-") and element_id[8:].isdigit():
+                self._chapter = self._new_chapter(int(element_id[8:]), depth, single=False)
+            elif tag == "div" and "userstuff" in classes and depth == self._chapters_depth + 1:
+                # Single-chapter works have their text directly in div#chapters.
+                self._chapter = self._new_chapter(1, depth, single=True)
+                self._capture("content", html=True)
+            return
+
+        if tag == "h3" and "title" in classes and self._chapter["title"] is None:
+            self._capture("title", html=False)
+        elif tag == "div" and "userstuff" in classes and self._chapter["content"] is None:
+            if not any(capture.name == "content" for capture in self._captures):
+                self._capture("content", html=True)
+
+    def handle_startendtag(self, tag, attrs):
+        raw = self.get_starttag_text()
+        for capture in self._captures:
+            capture.markup(raw)
+
+    def handle_endtag(self, tag):
+        if tag not in self._stack:
+            return
+        for capture in self._captures:
+            capture.markup(f"</{tag}>")
+        while self._stack:
+            if self._stack.pop() == tag:
+                break
+        depth = len(self._stack)
+
+        while self._captures and self._captures[-1].depth > depth:
+            self._finish_capture(self._captures.pop())
+
+        if self._chapter is not None and self._chapter["depth"] > depth:
+            chapter = self._chapter
+            self._chapter = None
+            if chapter["content"] is not None:
+                title = chapter["title"] or (
+                    self.metadata["title"] if chapter["single"] else f"Chapter {chapter['number']}"
+                )
+                self._ready.append((chapter["number"], title, chapter["content"]))
+        if self._chapters_depth is not None and self._chapters_depth > depth:
+            self._chapters_depth = -1
+
+    def _finish_capture(self, capture):
+        """Store the value of a completed capture."""
+        value = capture.value()
+        if capture.name == "work_title":
+            self.metadata["title"] = value
+        elif capture.name == "author":
+            self.metadata["author"] = value
+        elif capture.name == "description":
+            self.metadata["description"] = value
+        elif self._chapter is not None:
+            self._chapter[capture.name] = value
+
+    def handle_data(self, data):
+        for capture in self._captures:
+            capture.data(data)
+
+    def handle_entityref(self, name):
+        for capture in self._captures:
+            capture.data(f"&{name};")
+
+    def handle_charref(self, name):
+        for capture in self._captures:
+            capture.data(f"&#{name};")
+
+    def handle_comment(self, data):
+        for capture in self._captures:
+            capture.markup(f"<!--{data}-->")
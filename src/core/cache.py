@@ -0,0 +1,253 @@
+"""
+Persistent on-disk HTTP response cache.
+
+Response bodies are stored once per content hash as zlib-compressed files,
+and a small SQLite index maps URLs to bodies together with the validators
+(ETag / Last-Modified) needed for conditional revalidation. Each URL gets a
+time-to-live from the first matching pattern in CACHE_TTLS; stale entries
+are revalidated with a conditional GET. The total size of stored bodies is
+bounded and the least recently used ones are evicted first.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from ..config.config import (
+    CACHE_DEFAULT_TTL,
+    CACHE_DIR,
+    CACHE_MAX_BYTES,
+    CACHE_TTLS,
+)
+
+
+class ResponseCache:
+    """
+    Content-addressed, size-bounded cache of successful responses.
+
+    Attributes:
+        directory (str): Directory holding the index and the body files.
+        max_bytes (int): Upper bound for the compressed size of all bodies.
+        ttls (list): (compiled pattern, seconds) pairs; None means never cache.
+        default_ttl (int): TTL for URLs that match no pattern.
+    """
+    def __init__(self, directory, max_bytes=CACHE_MAX_BYTES, ttls=CACHE_TTLS,
+                 default_ttl=CACHE_DEFAULT_TTL):
+        """Open (or create) the cache in directory."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), check_same_thread=False
+        )
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS objects (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL REFERENCES objects(digest),
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_digest ON entries(digest);
+            CREATE INDEX IF NOT EXISTS idx_objects_last_access ON objects(last_access);
+        """)
+        self._db.commit()
+
+    def ttl(self, url):
+        """
+        Return the time-to-live for a URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            int: Seconds a stored response stays fresh, or None if the URL
+                must not be cached.
+        """
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def _path(self, digest):
+        """Return the file path of a body."""
+        return os.path.join(self.directory, "objects", digest[:2], f"{digest}.z")
+
+    def lookup(self, url):
+        """
+        Find the cached entry for a URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            dict: The entry with digest, etag, last_modified, stored_at and
+                fresh keys, or None if the URL is not cached.
+        """
+        ttl = self.ttl(url)
+        if ttl is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest, etag, last_modified, stored_at FROM entries WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        digest, etag, last_modified, stored_at = row
+        return {
+            "digest": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": stored_at,
+            "fresh": time.time() - stored_at < ttl,
+        }
+
+    def load(self, entry):
+        """
+        Read the body of a cached entry.
+
+        Args:
+            entry (dict): An entry returned by lookup().
+
+        Returns:
+            bytes: The decompressed body, or None if it is no longer on disk.
+        """
+        try:
+            with open(self._path(entry["digest"]), "rb") as f:
+                content = zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+        with self._lock:
+            self._db.execute(
+                "UPDATE objects SET last_access = ? WHERE digest = ?",
+                (time.time(), entry["digest"]),
+            )
+            self._db.commit()
+        return content
+
+    @staticmethod
+    def validators(entry):
+        """
+        Build conditional request headers for a cached entry.
+
+        Args:
+            entry (dict): An entry returned by lookup(), or None.
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since headers, possibly empty.
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def revalidated(self, url):
+        """Mark the entry for url as fresh again after a 304 response."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE entries SET stored_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self._db.commit()
+
+    def store(self, url, content, headers=None):
+        """
+        Store a successful response.
+
+        Args:
+            url (str): The requested URL.
+            content (bytes): The response body.
+            headers (Mapping, optional): The response headers.
+        """
+        if self.ttl(url) is None:
+            return
+        headers = headers or {}
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        now = time.time()
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = zlib.compress(content, 6)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            size = len(data)
+        else:
+            size = os.path.getsize(path)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO objects (digest, size, last_access) VALUES (?, ?, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET last_access = excluded.last_access",
+                (digest, size, now),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (url, digest, etag, last_modified, stored_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, digest, headers.get("ETag"), headers.get("Last-Modified"), now),
+            )
+            self._db.commit()
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used bodies until the size bound holds."""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT digest, size FROM objects ORDER BY last_access"
+        ).fetchall()
+        for digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+            self._db.execute("DELETE FROM objects WHERE digest = ?", (digest,))
+            try:
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+            total -= size
+        self._db.commit()
+
+    def close(self):
+        """Close the index database."""
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the process-wide response cache.
+
+    Returns:
+        ResponseCache: The shared cache, or None if CACHE_DIR is not set.
+    """
+    global _cache
+    if not CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(CACHE_DIR)
+        return _cache
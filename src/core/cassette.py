@@ -0,0 +1,229 @@
+"""
+Record/replay of HTTP traffic for offline scraping runs.
+
+In record mode every response fetched through a Scraper is written to a
+compact zip archive (an index.json plus deflated bodies, one per distinct
+body). In replay mode the archive answers the requests instead of the
+network, optionally adding synthetic latency and injecting errors so that
+full scrape and update pipelines can be benchmarked without a connection.
+"""
+import atexit
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import zipfile
+
+from requests.exceptions import ConnectionError, HTTPError
+from requests.structures import CaseInsensitiveDict
+
+from ..config.config import (
+    CASSETTE_ERROR_RATE,
+    CASSETTE_LATENCY,
+    CASSETTE_LATENCY_JITTER,
+    CASSETTE_MODE,
+    CASSETTE_PATH,
+)
+from .retry import PermanentError
+
+# Response headers kept in the archive; the rest only add noise.
+RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+
+class CassetteMissError(PermanentError):
+    """A replayed request has no recorded response."""
+
+
+class ReplayResponse:
+    """
+    Minimal stand-in for requests.Response built from a recorded entry.
+
+    Attributes:
+        url (str): The requested URL.
+        status_code (int): The recorded status code.
+        headers (CaseInsensitiveDict): The recorded headers.
+        content (bytes): The recorded body.
+    """
+    def __init__(self, url, status_code, headers, content):
+        """Initialize the response."""
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def text(self):
+        """str: The body decoded as UTF-8."""
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self):
+        """Raise HTTPError for 4xx and 5xx status codes."""
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def iter_content(self, chunk_size=1):
+        """Yield the body in chunks, like a streamed requests.Response."""
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        """Do nothing; there is no connection to release."""
+
+
+class Cassette:
+    """
+    A recorded set of HTTP responses.
+
+    Attributes:
+        path (str): Path of the zip archive.
+        mode (str): 'record' or 'replay'.
+        latency (float): Mean synthetic latency per replayed request, in seconds.
+        latency_jitter (float): Maximum deviation from latency, in seconds.
+        error_rate (float): Probability that a replayed request fails.
+        entries (dict): Recorded status, headers and body name keyed by URL.
+    """
+    def __init__(self, path, mode="replay", latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, seed=None):
+        """
+        Open a cassette.
+
+        Raises:
+            ValueError: If mode is not 'record' or 'replay'.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.entries = {}
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._archive = None
+        self._bodies = set()
+
+        if mode == "replay":
+            self._archive = zipfile.ZipFile(path, "r")
+            self.entries = json.loads(self._archive.read("index.json"))
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def wrap(self, transport):
+        """
+        Put the cassette in front of a transport.
+
+        Args:
+            transport (callable): Blocking callable invoked as transport(url, **kwargs).
+
+        Returns:
+            callable: A transport that records or replays responses.
+        """
+        if self.mode == "replay":
+            return self.replay
+
+        def record(url, **kwargs):
+            response = transport(url, **kwargs)
+            self.record(url, response)
+            return response
+        return record
+
+    def record(self, url, response):
+        """
+        Add a response to the archive.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): The response to store.
+        """
+        if response.status_code == 304:
+            return
+        content = response.content
+        name = f"bodies/{hashlib.sha256(content).hexdigest()}"
+        with self._lock:
+            if name not in self._bodies:
+                self._archive.writestr(name, content)
+                self._bodies.add(name)
+            self.entries[url] = {
+                "status": response.status_code,
+                "headers": {
+                    key: response.headers[key]
+                    for key in RECORDED_HEADERS if key in response.headers
+                },
+                "body": name,
+            }
+
+    def replay(self, url, **kwargs):
+        """
+        Answer a request from the archive.
+
+        Args:
+            url (str): The requested URL.
+            **kwargs: Ignored request options (headers, timeout, ...).
+
+        Returns:
+            ReplayResponse: The recorded response, or a synthetic 503.
+
+        Raises:
+            CassetteMissError: If the URL was never recorded.
+            ConnectionError: When an injected network error fires.
+        """
+        with self._lock:
+            delay = self.latency + self._random.uniform(-1, 1) * self.latency_jitter
+            fail = self._random.random() < self.error_rate
+            drop = self._random.random() < 0.5
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            if drop:
+                raise ConnectionError(f"Injected connection error for {url}")
+            return ReplayResponse(url, 503, {"Retry-After": "1"}, b"")
+
+        entry = self.entries.get(url)
+        if entry is None:
+            raise CassetteMissError(f"No recorded response for {url}")
+        with self._lock:
+            content = self._archive.read(entry["body"])
+        return ReplayResponse(url, entry["status"], entry["headers"], content)
+
+    def save(self):
+        """Write the index and close the archive."""
+        with self._lock:
+            if self._archive is None:
+                return
+            if self.mode == "record":
+                self._archive.writestr("index.json", json.dumps(self.entries, indent=1))
+                print(f"Recorded {len(self.entries)} responses to {self.path}")
+            self._archive.close()
+            self._archive = None
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """
+    Return the process-wide cassette configured through the environment.
+
+    Returns:
+        Cassette: The shared cassette, or None if SCRAPER_CASSETTE is not set.
+    """
+    global _cassette
+    if not CASSETTE_PATH:
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(
+                CASSETTE_PATH,
+                CASSETTE_MODE,
+                latency=CASSETTE_LATENCY,
+                latency_jitter=CASSETTE_LATENCY_JITTER,
+                error_rate=CASSETTE_ERROR_RATE,
+            )
+            atexit.register(_cassette.save)
+        return _cassette
@@ -0,0 +1,49 @@
+"""
+Compact record for a scraped chapter.
+
+Scrapers build a Chapter as soon as a chapter has been extracted. Its
+content is serialized to an HTML string right away, so no reference to a
+parse tree outlives the page it came from.
+"""
+import hashlib
+
+
+class Chapter:
+    """
+    A scraped chapter.
+
+    Attributes:
+        num (int): The chapter number.
+        title (str): The chapter title.
+        html (str): The chapter content as serialized HTML.
+        length (int): Size of the UTF-8 encoded content in bytes.
+        digest (str): BLAKE2b hex digest of the UTF-8 encoded content.
+    """
+    __slots__ = ("num", "title", "html", "length", "digest")
+
+    def __init__(self, num, title, html):
+        """
+        Build the record, serializing the content if it is still a node.
+
+        Args:
+            num (int | str): The chapter number.
+            title (str): The chapter title.
+            html (str | Node): The chapter content.
+        """
+        self.num = int(num)
+        self.title = title
+        self.html = html if isinstance(html, str) else str(html)
+        data = self.html.encode("utf-8")
+        self.length = len(data)
+        self.digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def __repr__(self):
+        return f"Chapter(num={self.num!r}, title={self.title!r}, length={self.length})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Chapter):
+            return NotImplemented
+        return (self.num, self.title, self.digest) == (other.num, other.title, other.digest)
+
+    def __hash__(self):
+        return hash((self.num, self.title, self.digest))
@@ -0,0 +1,188 @@
+"""
+Asynchronous fetch engine shared by every scraper in the process.
+
+The engine owns a background asyncio event loop. Blocking HTTP calls are run
+on a thread pool from that loop so that many requests can be in flight at
+once, while a global semaphore and one semaphore per host cap how many of
+them target the same site and a shared RateLimiter paces each host.
+Per-host circuit breakers are kept here as well so every scraper sees the
+same host health.
+Synchronous callers use run() to wait for a coroutine scheduled on the
+engine loop.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+from ..config.config import (
+    DEFAULT_HOST_CONCURRENCY,
+    HOST_CONCURRENCY,
+    MAX_CONCURRENCY,
+)
+from .rate_limiter import RateLimiter
+from .retry import CircuitBreakers
+
+
+def host_of(url):
+    """
+    Return the host name of a URL.
+
+    Args:
+        url (str): An absolute URL.
+
+    Returns:
+        str: The lower-cased host name, or an empty string.
+    """
+    return (urlsplit(url).hostname or "").lower()
+
+
+class FetchEngine:
+    """
+    Run blocking HTTP requests concurrently with per-host limits.
+
+    Attributes:
+        max_concurrency (int): Maximum number of requests in flight overall.
+        host_concurrency (dict): Maximum requests in flight per host name.
+        default_host_concurrency (int): Limit for hosts not in host_concurrency.
+        limiter (RateLimiter): Adaptive per-host rate limiter.
+        breakers (CircuitBreakers): Per-host circuit breakers.
+    """
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, host_concurrency=None,
+                 default_host_concurrency=DEFAULT_HOST_CONCURRENCY, limiter=None):
+        """Initialize the engine; the event loop is started on first use."""
+        self.max_concurrency = max_concurrency
+        self.host_concurrency = dict(HOST_CONCURRENCY)
+        if host_concurrency:
+            self.host_concurrency.update(host_concurrency)
+        self.default_host_concurrency = default_host_concurrency
+        self.limiter = limiter or RateLimiter()
+        self.breakers = CircuitBreakers()
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._global_semaphore = None
+        self._host_semaphores = {}
+
+    @property
+    def loop(self):
+        """asyncio.AbstractEventLoop: The engine loop, started lazily."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix="fetch",
+                )
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="fetch-engine",
+                    daemon=True,
+                )
+                self._thread.start()
+                self._global_semaphore = None
+                self._host_semaphores = {}
+        return self._loop
+
+    def _semaphores(self, host):
+        """Return the (global, per-host) semaphores; call on the engine loop."""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            limit = self.host_concurrency.get(host, self.default_host_concurrency)
+            semaphore = asyncio.Semaphore(max(1, limit))
+            self._host_semaphores[host] = semaphore
+        return self._global_semaphore, semaphore
+
+    async def request(self, url, transport, rate=None, paced=True, **kwargs):
+        """
+        Perform one blocking request without blocking the event loop.
+
+        The host's rate limiter is consulted before the request and fed the
+        status code and latency afterwards, unless the request is not paced.
+
+        Args:
+            url (str): The URL to request.
+            transport (callable): Blocking callable invoked as transport(url, **kwargs).
+            rate (float, optional): Starting rate for a host without a policy.
+            paced (bool, optional): Go through the rate limiter. Replayed
+                requests are not paced, since no site is contacted. Defaults to True.
+            **kwargs: Extra keyword arguments passed to transport.
+
+        Returns:
+            object: Whatever transport returned, usually a requests.Response.
+        """
+        host = host_of(url)
+        if paced:
+            await self.limiter.acquire(host, rate)
+        global_semaphore, host_semaphore = self._semaphores(host)
+        async with global_semaphore, host_semaphore:
+            loop = asyncio.get_running_loop()
+            started = time.monotonic()
+            try:
+                response = await loop.run_in_executor(
+                    self._executor, partial(transport, url, **kwargs)
+                )
+            except Exception:
+                if paced:
+                    self.limiter.record(host, None, time.monotonic() - started)
+                raise
+            if paced:
+                self.limiter.record(
+                    host, getattr(response, "status_code", None), time.monotonic() - started
+                )
+            return response
+
+    def run(self, coro):
+        """
+        Run a coroutine on the engine loop and wait for its result.
+
+        Args:
+            coro (coroutine): The coroutine to run.
+
+        Returns:
+            object: The coroutine's result.
+
+        Raises:
+            RuntimeError: If called from the engine loop itself.
+        """
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("FetchEngine.run() cannot be called from the engine loop.")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def close(self):
+        """Stop the event loop and release the worker threads."""
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._executor.shutdown(wait=False)
+            self._loop = None
+            self._thread = None
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the process-wide fetch engine, creating it on first use.
+
+    Returns:
+        FetchEngine: The shared engine.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine()
+        return _engine
@@ -1,6 +1,10 @@
+import re
+from datetime import datetime, timezone
+
+from .chapter import Chapter
+from .parsers import parse
 from .scraper import Scraper
-from bs4 import BeautifulSoup
-from time import sleep
+from .story import StoryStream
 
 class FanfictionNet(Scraper):
     """
@@ -8,13 +12,46 @@ class FanfictionNet(Scraper):
     
     Inherits from Scraper and provides methods to fetch story metadata
     and chapter content from fanfiction.net.
+
+    The chapter count on the story page decides exactly which chapters to
+    fetch, so no request is spent probing past the last chapter.
     """
-    def __init__(self, rate_limit=2):
-        """Initialize FanfictionNet scraper with base URL."""
-        super().__init__(rate_limit)
-        self.base_url = "https://m.fanfiction.net"
+    base_url = "https://m.fanfiction.net"
+
+    # Elements read from the story and chapter pages.
+    METADATA_TARGETS = ("div#content",)
+    CHAPTER_TARGETS = ("#storycontent",)
+    # Boxes FanfictionNet shows its error messages in.
+    WARNING_TARGETS = (".gui_warning", ".panel_warning")
+    NOT_FOUND_MESSAGES = ("Chapter not found", "Story Not Found")
+
+    def __init__(self, rate_limit=2, **kwargs):
+        """Initialize FanfictionNet scraper."""
+        super().__init__(rate_limit, **kwargs)
         self.old_url = "https://www.fanfiction.net"
+        self.probed = None
     
+    def is_not_found(self, content: bytes) -> bool:
+        """
+        Detect FanfictionNet's "not found" pages, which are served with a 200.
+
+        Only the error boxes are searched for the message, so a story or
+        chapter that merely mentions it is not mistaken for a missing page.
+        Pages without the message are not parsed.
+
+        Args:
+            content (bytes): The response content.
+
+        Returns:
+            bool: True if the story or chapter does not exist.
+        """
+        if not any(message.encode() in content for message in self.NOT_FOUND_MESSAGES):
+            return False
+        warnings = self.parse(content, self.WARNING_TARGETS).select(", ".join(self.WARNING_TARGETS))
+        return any(
+            message in warning.text() for warning in warnings for message in self.NOT_FOUND_MESSAGES
+        )
+
     def metadata(self, story_id: int) -> dict:
         """
         Extract metadata for a story from FanfictionNet.
@@ -23,34 +60,85 @@ class FanfictionNet(Scraper):
             story_id (int): The story ID on FanfictionNet.
             
         Returns:
-            dict: Dictionary containing title, author, description, and image URL.
+            dict: Dictionary containing title, author, description, image URL,
+                chapter count, word count and the updated (or published) time
+                as an aware datetime. The last three are None if the story
+                page does not show them.
             
         Raises:
             ValueError: If the story content cannot be found.
         """
         url = f"{self.base_url}/s/{story_id}"
         reponse = self.retry_fetch(url)
-        soup = BeautifulSoup(reponse, self.parser)
-        content = soup.find(id="content")
+        content = self.parse(reponse, self.METADATA_TARGETS, required=("#content",)).select_one("#content")
         if content is None:
             raise ValueError("Story not found")
         metadata = {
-            "title": content.find("b").get_text(strip=True),
-            "author": content.find("a").get_text(strip=True),
+            "title": content.select_one("b").text(strip=True),
+            "author": content.select_one("a").text(strip=True),
             "description": " ",
             "img_url": None
         }
+        metadata.update(self.story_stats(content))
         return metadata
 
-    def story(self, story_id: int = None) -> dict:
+    def fingerprint(self, story_id):
+        """
+        Read a story's chapter count and update time from its story page.
+
+        Args:
+            story_id (int): The story ID.
+
+        Returns:
+            str: The chapter count and update time, or None if the story
+                page shows neither.
+        """
+        metadata = self.metadata(story_id)
+        if metadata["chapters"] is None and metadata["updated"] is None:
+            return None
+        updated = metadata["updated"].isoformat() if metadata["updated"] else ""
+        fingerprint = f"{metadata['chapters']}:{updated}"
+        self.probed = (story_id, metadata, fingerprint)
+        return fingerprint
+
+    def story_stats(self, content):
+        """
+        Read the chapter count, word count and update time of a story.
+
+        Args:
+            content (Node): The parsed #content element of the story page.
+
+        Returns:
+            dict: 'chapters', 'words' and 'updated' values; None when missing.
         """
-        Fetch an entire story including metadata and all chapters.
+        text = content.text(separator=" ")
+        words = re.search(r"Words:\s*([\d,]+)", text)
+        chapters = re.search(r"Chapters:\s*([\d,]+)", text)
+        if chapters:
+            chapters = int(chapters.group(1).replace(",", ""))
+        elif words:
+            # One-shots have no "Chapters:" entry.
+            chapters = 1
+        # "Updated:" comes before "Published:" and is left out until the
+        # story is updated, so the first timestamp is the latest one.
+        stamp = content.select_one("span[data-xutime]")
+        return {
+            "chapters": chapters,
+            "words": int(words.group(1).replace(",", "")) if words else None,
+            "updated": (
+                datetime.fromtimestamp(int(stamp["data-xutime"]), timezone.utc)
+                if stamp else None
+            ),
+        }
+
+    def iter_story(self, story_id: int = None) -> StoryStream:
+        """
+        Start scraping a story; chapters are fetched as the stream is read.
         
-        Prompts user for story ID and fetches all available chapters
-        with retry logic.
+        Prompts user for story ID when none is given.
         
         Returns:
-            dict: Dictionary with 'metadata' and 'chapters' keys, or None if user exits.
+            StoryStream: The story, or None if user exits.
         """
         if story_id is None:
             story_id = input(
@@ -67,23 +155,58 @@ class FanfictionNet(Scraper):
         
         metadata = self.metadata(story_id)
 
-        chapters = []
-        chapter_number = 1
+        if metadata["chapters"] is None:
+            chapters = self.probe(story_id, 1)
+        else:
+            chapters = self.download(story_id, range(1, metadata["chapters"] + 1))
+        return StoryStream(metadata, chapters, id=story_id)
 
-        sleep(self.rate_limit)
-        
+    def download(self, story_id, chapter_numbers):
+        """
+        Fetch the given chapters concurrently within the rate limit.
+
+        Downloading stops at the first chapter that fails, so the result
+        never has gaps.
+
+        Args:
+            story_id (int): The story ID.
+            chapter_numbers (range): The chapter numbers to fetch, in order.
+
+        Yields:
+            Chapter: The fetched chapters.
+        """
+        urls = [f"{self.base_url}/s/{story_id}/{n}" for n in chapter_numbers]
+        for chapter_number, (url, result) in zip(
+            chapter_numbers, self.fetch_extract_many(urls, extract_chapter)
+        ):
+            if isinstance(result, Exception):
+                print(f"Failed to fetch {url}: {result}")
+                return
+            print(f"Fetched chapter {chapter_number}")
+            yield Chapter(chapter_number, f"Chapter {chapter_number}", result)
+
+    def probe(self, story_id, chapter_number):
+        """
+        Fetch chapters one by one until one is missing.
+
+        Only used when the story page does not show a chapter count.
+
+        Args:
+            story_id (int): The story ID.
+            chapter_number (int): The first chapter number to fetch.
+
+        Yields:
+            Chapter: The fetched chapters.
+        """
         while True:
             try:
                 chapter_content = self.chapter(story_id, chapter_number)
-                print(f"Fetched chapter {chapter_number}")
-                sleep(self.rate_limit)
-                chapters.append((str(chapter_number), f"Chapter {chapter_number}", chapter_content))
-                print(f"Fetching chapter {chapter_number + 1}")
-                chapter_number += 1
             except Exception as e:
                 print(f"{e}")
-                break
-        return {"metadata": metadata, "chapters": chapters, "id": story_id}
+                return
+            print(f"Fetched chapter {chapter_number}")
+            yield Chapter(chapter_number, f"Chapter {chapter_number}", chapter_content)
+            chapter_number += 1
 
     def chapter(self, story_id: int, chapter_number: int) -> str:
         """
@@ -102,13 +225,7 @@ class FanfictionNet(Scraper):
         url = f"{self.base_url}/s/{story_id}/{chapter_number}"
         reponse = self.retry_fetch(url)
         
-        soup = BeautifulSoup(reponse, self.parser)
-
-        chapter = soup.find(id="storycontent")
-        if chapter is None:
-            raise ValueError("Chapter content not found")
-        
-        return str(chapter)
+        return self.extract(extract_chapter, reponse)
 
     def update(self, story_id: int, last_chapter_number: int) -> tuple[list[tuple], int]:
         """
@@ -117,23 +234,63 @@ class FanfictionNet(Scraper):
             story_id (int): The story ID.
             last_chapter_number (int): The last chapter number that was scraped.
         Returns:
-            list: List of tuples containing (chapter_num, chapter_title, content) for new chapters.
+            tuple: List of Chapter records for new chapters, and the story ID.
         """
-        new_chapters = []
-        chapter_number = last_chapter_number + 1
+        return list(self.iter_updates(story_id, last_chapter_number)), story_id
 
-        sleep(self.rate_limit)
+    def iter_updates(self, story_id: int, last_chapter_number: int) -> StoryStream:
+        """
+        Start fetching the chapters added since the last scrape, lazily.
 
-        while True:
-            try:
-                chapter_content = self.chapter(story_id, chapter_number)
-                print(f"Fetched new chapter {chapter_number}")
-                sleep(self.rate_limit)
-                new_chapters.append((str(chapter_number), f"Chapter {chapter_number}", chapter_content))
-                print(f"Fetching chapter {chapter_number + 1}")
-                chapter_number += 1
-            except Exception as e:
-                print(f"No more new chapters found: {e}")
-                break
+        Makes no chapter requests when the chapter count has not grown. The
+        story page read by fingerprint() just before is reused.
+
+        Args:
+            story_id (int): The story ID.
+            last_chapter_number (int): The last chapter number that was scraped.
+
+        Returns:
+            StoryStream: The story's current metadata and its new chapters.
+        """
+        probed, self.probed = self.probed, None
+        if probed is not None and probed[0] == story_id:
+            metadata, fingerprint = probed[1:]
+        else:
+            metadata, fingerprint = self.metadata(story_id), None
+        total = metadata["chapters"]
+        expected = None
+        if total is None:
+            chapters = self.probe(story_id, last_chapter_number + 1)
+        elif total <= last_chapter_number:
+            print(f"No new chapters for story {story_id} ({total} chapters).")
+            chapters, expected = (), 0
+        else:
+            chapters = self.download(story_id, range(last_chapter_number + 1, total + 1))
+            expected = total - last_chapter_number
+        return StoryStream(metadata, chapters, id=story_id, fingerprint=fingerprint, expected=expected)
+
+
+def extract_chapter(page, parser):
+    """
+    Extract the chapter content from a FanfictionNet chapter page.
+
+    Runs in a parse worker process, so it takes and returns only picklable
+    values.
+
+    Args:
+        page (bytes): The raw chapter page.
+        parser (str): The parser backend.
+
+    Returns:
+        str: HTML string containing the chapter content.
+
+    Raises:
+        ValueError: If chapter content cannot be found.
+    """
+    chapter = parse(
+        page, parser, FanfictionNet.CHAPTER_TARGETS, required=("#storycontent",)
+    ).select_one("#storycontent")
+    if chapter is None:
+        raise ValueError("Chapter content not found")
 
-        return new_chapters, story_id
\ No newline at end of file
+    return str(chapter)
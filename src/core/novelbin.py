@@ -1,6 +1,9 @@
+from urllib.parse import urljoin, urlparse
+
+from .chapter import Chapter
+from .parsers import parse
 from .scraper import Scraper
-from bs4 import BeautifulSoup
-from time import sleep
+from .story import StoryStream
 
 class NovelBin(Scraper):
     """
@@ -8,12 +11,21 @@ class NovelBin(Scraper):
     
     Inherits from Scraper and provides methods to search, fetch metadata,
     and scrape chapter content from novelbin.me.
+
+    Chapters are located through the novel's chapter archive and downloaded
+    concurrently; following the "next chapter" links one page at a time is
+    only the fallback when the archive cannot be read.
     """
-    def __init__(self, rate_limit=2):
-        """Initialize NovelBin scraper with base URL."""
-        super().__init__(rate_limit)
-        self.base_url = "https://novelbin.com"
+    base_url = "https://novelbin.com"
+
+    # Elements read from a chapter page; the rest of the page is not parsed.
+    CHAPTER_TARGETS = ("div#chr-content", "span.chr-text", "h2", "a#next_chap")
+
+    def __init__(self, rate_limit=2, **kwargs):
+        """Initialize NovelBin scraper."""
+        super().__init__(rate_limit, **kwargs)
         self.last_chapter_scraped = None
+        self.probed = None
 
     def search(self, keyword):
         """
@@ -27,16 +39,14 @@ class NovelBin(Scraper):
         """
         url = f"{self.base_url}/search?keyword={keyword.replace(' ', '+')}"
         reponse = self.retry_fetch(url)
-        links = BeautifulSoup(reponse, "html.parser").find_all(
-            "h3", class_="novel-title"
-        )
+        links = self.parse(reponse).select("h3.novel-title a")
 
         i = 0
         array = []
 
         for link in links:
-            array.append(str(link.find("a")["href"]))
-            print(f"{i}. {link.find('a').getText()}")
+            array.append(link["href"])
+            print(f"{i}. {link.text()}")
             i += 1
 
         answer = int(input("Select a novel by entering its number: "))
@@ -53,26 +63,26 @@ class NovelBin(Scraper):
             tuple: A tuple containing (metadata dict, next_chapter element).
         """
         reponse = self.retry_fetch(url)
-        soup = BeautifulSoup(reponse, self.parser)
+        doc = self.parse(reponse)
 
-        title = soup.find("h3", class_="title").getText()
+        title = doc.select_one("h3.title").text()
         try:
-            img = soup.find("img", class_="lazy")["data-src"]
+            img = doc.select_one("img.lazy")["data-src"]
         except Exception:
             img = None
-        desc = soup.find("div", class_="desc-text")
+        desc = doc.select_one("div.desc-text")
 
         try:
             author = (
-                soup.find("ul", class_="info info-meta")
-                .getText()
+                doc.select_one("ul.info.info-meta")
+                .text()
                 .split(" ")[0]
                 .split("\n")[3]
             )
         except Exception:
             author = "Unknown"
         
-        next_chapter = soup.find(title="READ NOW", href=True)
+        next_chapter = doc.select_one('[title="READ NOW"][href]')
         return {
             "title": title,
             "author": author,
@@ -80,14 +90,15 @@ class NovelBin(Scraper):
             "description": str(desc), 
         }, next_chapter
 
-    def story(self, url=None):
+    def iter_story(self, url=None):
         """
-        Fetch an entire novel including metadata and all chapters.
+        Start scraping a novel; chapters are fetched as the stream is read.
         
-        Prompts user for search keyword and fetches all available chapters.
+        Prompts user for search keyword when no URL is given.
         
         Returns:
-            dict: Dictionary with 'metadata' and 'chapters' keys, or None if user exits.
+            StoryStream: The novel, with the novel slug as its id, or None
+                if user exits.
         """
         if url is None:
             keyword = input(
@@ -95,32 +106,156 @@ class NovelBin(Scraper):
             )
             if keyword.lower() == 'exit':
                 return None
-            metadata, next_chapter = self.metadata(self.search(keyword))
+            url = self.search(keyword)
 
-        else:
-            metadata, next_chapter = self.metadata(url)
+        metadata, next_chapter = self.metadata(url)
         self.last_chapter_scraped = None
 
-        chapter_num = 0
-        chapters = []
-        sleep(self.rate_limit)
+        index = self.chapter_index(url)
+        if index:
+            chapters = self.download(index, 0)
+        else:
+            chapters = self.walk(next_chapter["href"] if next_chapter else None, 0)
+        stream = StoryStream(metadata, id=self.novel_slug(url))
+        stream.chapters = self.track(stream, chapters, "Scraping completed.")
+        return stream
 
-        while True:
-            try:
-                next_chapter, chapter_num, title, content = self.chapter(
-                next_chapter["href"], chapter_num)
-                print(f"Fetched chapter {chapter_num}: {title}")
-                chapters.append((str(chapter_num), title, content))
-                print(f"Fetching chapter from {next_chapter['href']}")
-                sleep(self.rate_limit)
+    def track(self, stream, chapters, done):
+        """
+        Keep a stream's last_chapter_scraped in step with the chapters it yields.
+
+        Args:
+            stream (StoryStream): The stream being filled.
+            chapters (iterator): The Chapter records.
+            done (str): Message printed when the chapters run out.
+
+        Yields:
+            Chapter: The chapters, unchanged.
+        """
+        for chapter in chapters:
+            stream.last_chapter_scraped = self.last_chapter_scraped
+            yield chapter
+        print(done)
+        if stream.last_chapter_scraped:
+            print(f"{stream.last_chapter_scraped} was the last chapter found.")
+        else:
+            print("No new chapters found.")
+    
+    def novel_slug(self, url):
+        """
+        Extract the novel slug from a novel or chapter URL.
+
+        Args:
+            url (str): A URL such as https://novelbin.com/b/<slug>/chapter-1.
+
+        Returns:
+            str: The slug, or None if the URL is not a NovelBin novel URL.
+        """
+        parts = urlparse(url).path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "b":
+            return None
+        return parts[1]
 
+    def chapter_index(self, url):
+        """
+        Fetch the ordered list of chapter URLs from the novel's chapter archive.
+
+        Args:
+            url (str): The novel URL or the URL of any of its chapters.
+
+        Returns:
+            list: Chapter URLs in reading order, or None if the archive is
+                unavailable.
+        """
+        slug = self.novel_slug(url)
+        if slug is None:
+            return None
+        try:
+            page = self.retry_fetch(f"{self.base_url}/ajax/chapter-archive?novelId={slug}")
+        except Exception as e:
+            print(f"Chapter index unavailable for {slug}: {e}")
+            return None
+
+        doc = self.parse(page, ("ul.list-chapter",), required=("ul.list-chapter",))
+        links = doc.select("ul.list-chapter li a[href]")
+        index = []
+        for link in links:
+            href = urljoin(self.base_url, link["href"])
+            if href not in index:
+                index.append(href)
+        return index or None
+
+    def fingerprint(self, url):
+        """
+        Read the latest chapter from the novel page.
+
+        The novel page is a fixed size, unlike the chapter archive, which
+        grows with every chapter.
+
+        Args:
+            url (str): The novel URL or the URL of any of its chapters.
+
+        Returns:
+            str: The path of the latest chapter, or None if the novel page
+                does not show it.
+        """
+        slug = self.novel_slug(url)
+        if slug is None:
+            return None
+        page = self.retry_fetch(f"{self.base_url}/b/{slug}")
+        doc = self.parse(page, ("div.l-chapter",), required=("div.l-chapter",))
+        latest = doc.select_one("div.l-chapter a.chapter-title[href]")
+        if latest is None:
+            return None
+        fingerprint = urlparse(urljoin(self.base_url, latest["href"])).path
+        self.probed = (slug, fingerprint)
+        return fingerprint
+
+    def download(self, urls, chapter_num):
+        """
+        Download chapters concurrently, keeping them in reading order.
+
+        Requests stay within the host's rate limit. Downloading stops at the
+        first chapter that fails, so the result never has gaps.
+
+        Args:
+            urls (list): Chapter URLs in reading order.
+            chapter_num (int): The number of the chapter before the first URL.
+
+        Yields:
+            Chapter: The fetched chapters.
+        """
+        for url, result in self.fetch_extract_many(urls, extract_chapter):
+            if isinstance(result, Exception):
+                print(f"Failed to fetch {url}: {result}")
+                return
+            title, content, _ = result
+            chapter_num += 1
+            self.last_chapter_scraped = url
+            print(f"Fetched chapter {chapter_num}: {title}")
+            yield Chapter(chapter_num, title, content)
+
+    def walk(self, next_href, chapter_num):
+        """
+        Fetch chapters one by one by following the "next chapter" links.
+
+        Args:
+            next_href (str): URL of the first chapter to fetch.
+            chapter_num (int): The number of the chapter before it.
+
+        Yields:
+            Chapter: The fetched chapters.
+        """
+        while next_href and "/null" not in next_href:
+            try:
+                next_href, chapter_num, title, content = self.chapter(
+                next_href, chapter_num)
             except Exception as e:
                 print(f"{e}")
-                break
-        print("Scraping completed.")    
-        print(f"{self.last_chapter_scraped} was the last chapter found.")
-        return {"metadata": metadata, "chapters": chapters, "last_chapter_scraped": self.last_chapter_scraped}
-    
+                return
+            print(f"Fetched chapter {chapter_num}: {title}")
+            yield Chapter(chapter_num, title, content)
+
     def chapter(self, url, chapter_num):
         """
         Fetch a specific chapter from a novel.
@@ -130,27 +265,21 @@ class NovelBin(Scraper):
             chapter_num (int): The current chapter number.
             
         Returns:
-            tuple: A tuple containing (next_chapter element, chapter_num, title, content).
+            tuple: A tuple containing (next_chapter href, chapter_num, title, content).
         """
         try:
             page = self.retry_fetch(url)
         except Exception:
             raise ValueError("Chapter not found")
-        soup = BeautifulSoup(page, "html.parser")
-        content = soup.find("div", id="chr-content").get_text(separator="\n")
-        
-        try:
-            title = soup.find("span", class_="chr-text").getText(strip=True)
-        except TypeError:
-            title = soup.find("h2").getText(strip=True)
+        title, content, next_href = self.extract(extract_chapter, page)
 
         chapter_num += 1
         self.last_chapter_scraped = url
-        next_chapter = soup.find("a", id="next_chap")
         
-        return next_chapter, chapter_num, title, str(self.text_to_html(content))
+        return next_href, chapter_num, title, content
     
-    def text_to_html(self, text):
+    @staticmethod
+    def text_to_html(text):
         """
         Convert plain text to HTML paragraphs.
         
@@ -172,30 +301,65 @@ class NovelBin(Scraper):
             last_chapter_url (str): The URL of the last chapter scraped.
             last_chapter_number (int): The last chapter number that was scraped.
         Returns:
-            tuple: A tuple containing (list of new chapters, last_chapter_scraped element).
+            tuple: A tuple containing (list of new chapters, last_chapter_scraped href).
+        """
+        stream = self.iter_updates(last_chapter_url, last_chapter_number)
+        new_chapters = list(stream)
+        return new_chapters, stream.last_chapter_scraped
+
+    def iter_updates(self, last_chapter_url, last_chapter_number):
+        """
+        Start fetching the chapters added since the last scrape, lazily.
+
+        Args:
+            last_chapter_url (str): The URL of the last chapter scraped.
+            last_chapter_number (int): The last chapter number that was scraped.
+
+        Returns:
+            StoryStream: The new chapters; last_chapter_scraped follows them.
+                The fingerprint read by fingerprint() just before is only
+                kept when the chapter archive ends at the same chapter.
         """
         self.last_chapter_scraped = None
-        page = self.retry_fetch(last_chapter_url)
-        soup = BeautifulSoup(page, "html.parser")
-        next_chapter = soup.find("a", id="next_chap")
-        new_chapters = []
+        probed, self.probed = self.probed, None
+        stream = StoryStream()
+        index = self.chapter_index(last_chapter_url)
+        if index and last_chapter_url in index:
+            missing = index[index.index(last_chapter_url) + 1:]
+            new_chapters = self.download(missing, last_chapter_number)
+            if probed is not None and probed == (self.novel_slug(last_chapter_url), urlparse(index[-1]).path):
+                stream.fingerprint, stream.expected = probed[1], len(missing)
+        else:
+            page = self.retry_fetch(last_chapter_url)
+            doc = self.parse(page, ("a#next_chap",), required=("a#next_chap",))
+            next_chapter = doc.select_one("a#next_chap")
+            new_chapters = self.walk(
+                next_chapter.attr("href") if next_chapter else None, last_chapter_number
+            )
+        stream.chapters = self.track(stream, new_chapters, "Update completed.")
+        return stream
 
-        sleep(self.rate_limit)
-        
-        while True:
 
-            try:
-                if "/null" in next_chapter["href"]:
-                    print("No new chapters found.")
-                    break
-
-                next_chapter, last_chapter_number, title, content = self.chapter(
-                    next_chapter["href"], last_chapter_number
-                )
-                print(f"Fetched new chapter {last_chapter_number}: {title}")
-                sleep(self.rate_limit)
-                new_chapters.append((str(last_chapter_number), title, content))
-            except Exception as e:
-                print(f"{e}")
-                break
-        return new_chapters, self.last_chapter_scraped
\ No newline at end of file
+def extract_chapter(page, parser):
+    """
+    Extract a NovelBin chapter page into plain data.
+
+    Runs in a parse worker process, so it takes and returns only picklable
+    values.
+
+    Args:
+        page (bytes): The raw chapter page.
+        parser (str): The parser backend.
+
+    Returns:
+        tuple: (title, content HTML, next chapter href or None).
+    """
+    doc = parse(page, parser, NovelBin.CHAPTER_TARGETS, required=("div#chr-content",))
+    content = doc.select_one("div#chr-content").text(separator="\n")
+
+    title_node = doc.select_one("span.chr-text") or doc.select_one("h2")
+    title = title_node.text(strip=True)
+
+    next_chapter = doc.select_one("a#next_chap")
+    next_href = next_chapter.attr("href") if next_chapter else None
+    return title, NovelBin.text_to_html(content), next_href
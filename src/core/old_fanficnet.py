@@ -1,6 +1,4 @@
 from .fanficnet import FanFicNet
-from time import sleep
-from bs4 import BeautifulSoup
 
 class OldFanFicNet(FanFicNet):
     def __init__(self):
@@ -18,13 +16,13 @@ class OldFanFicNet(FanFicNet):
         """
         url = f"{self.old_url}/s/{story_id}"
         reponse = self.retry_fetch(url)
-        soup = BeautifulSoup(reponse, self.parser)
+        doc = self.parse(reponse)
         try:
             return {
-            "title": soup.find("b", class_="xcontrast_txt").get_text(strip=True),
-            "author": soup.find("a", class_="xcontrast_txt").get_text(strip=True),
-            "description": soup.find("div", class_="xcontrast_txt"),
-            "img_url": soup.find("img", class_="cimage")["src"]
+            "title": doc.select_one("b.xcontrast_txt").text(strip=True),
+            "author": doc.select_one("a.xcontrast_txt").text(strip=True),
+            "description": doc.select_one("div.xcontrast_txt"),
+            "img_url": doc.select_one("img.cimage")["src"]
         }
         except Exception:
             return None
@@ -43,8 +41,7 @@ class OldFanFicNet(FanFicNet):
         """
         url = f"{self.old_url}/s/{story_id}/{chapter_number}"
         reponse = self.retry_fetch(url)
-        soup = BeautifulSoup(reponse, self.parser)
-        content = soup.find(id="storytextp")
+        content = self.parse(reponse).select_one("#storytextp")
         if content is None:
             raise ValueError("Chapter not found")
         return str(content)
\ No newline at end of file
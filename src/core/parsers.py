@@ -0,0 +1,291 @@
+"""
+Pluggable HTML parser backends behind a small selector API.
+
+Scrapers parse pages with parse() and query them with CSS selectors through
+Node, so the parser can be swapped without touching the extraction code.
+Supported backends are BeautifulSoup with the pure-Python "html.parser",
+BeautifulSoup with "lxml", and selectolax (lexbor engine) when installed.
+
+A parse can be restricted to a few target elements: with the BeautifulSoup
+backends only the matching subtrees are built, which saves most of the time
+and memory spent on page chrome.
+"""
+import abc
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from ..config.config import PARSER_BACKEND
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+
+class Node(abc.ABC):
+    """
+    Backend-independent view of an element or a whole document.
+
+    Each backend implements the abstract query methods in a subclass.
+
+    Attributes:
+        element: The wrapped bs4 Tag / BeautifulSoup or selectolax node.
+    """
+    __slots__ = ("element",)
+
+    def __init__(self, element):
+        """Wrap a backend element."""
+        self.element = element
+
+    @abc.abstractmethod
+    def select_one(self, selector):
+        """
+        Return the first descendant matching a CSS selector.
+
+        Args:
+            selector (str): The CSS selector.
+
+        Returns:
+            Node: The match, or None.
+        """
+
+    @abc.abstractmethod
+    def select(self, selector):
+        """
+        Return every descendant matching a CSS selector.
+
+        Args:
+            selector (str): The CSS selector.
+
+        Returns:
+            list: Matching Node objects in document order.
+        """
+
+    @abc.abstractmethod
+    def text(self, separator="", strip=False):
+        """
+        Return the text content.
+
+        Args:
+            separator (str): String inserted between text fragments.
+            strip (bool): Whether to strip whitespace from each fragment.
+
+        Returns:
+            str: The text.
+        """
+
+    @abc.abstractmethod
+    def attr(self, name, default=None):
+        """
+        Return an attribute value.
+
+        Args:
+            name (str): The attribute name.
+            default: Value returned when the attribute is missing.
+
+        Returns:
+            str: The attribute value, or default.
+        """
+
+    @abc.abstractmethod
+    def html(self):
+        """
+        Return the outer HTML.
+
+        Returns:
+            str: The serialized element.
+        """
+
+    def __getitem__(self, name):
+        """Return an attribute value, raising KeyError if it is missing."""
+        value = self.attr(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __str__(self):
+        """Return the outer HTML."""
+        return self.html()
+
+
+class SoupNode(Node):
+    """Node backed by BeautifulSoup."""
+    __slots__ = ()
+
+    def select_one(self, selector):
+        match = self.element.select_one(selector)
+        return SoupNode(match) if match is not None else None
+
+    def select(self, selector):
+        return [SoupNode(match) for match in self.element.select(selector)]
+
+    def text(self, separator="", strip=False):
+        return self.element.get_text(separator=separator, strip=strip)
+
+    def attr(self, name, default=None):
+        value = self.element.get(name, default)
+        if isinstance(value, list):
+            value = " ".join(value)
+        return value
+
+    def html(self):
+        return str(self.element)
+
+
+class SelectolaxNode(Node):
+    """Node backed by selectolax."""
+    __slots__ = ()
+
+    def select_one(self, selector):
+        match = self.element.css_first(selector)
+        return SelectolaxNode(match) if match is not None else None
+
+    def select(self, selector):
+        return [SelectolaxNode(match) for match in self.element.css(selector)]
+
+    def text(self, separator="", strip=False):
+        return self.element.text(deep=True, separator=separator, strip=strip)
+
+    def attr(self, name, default=None):
+        return getattr(self.element, "attributes", {}).get(name, default)
+
+    def html(self):
+        return self.element.html
+
+
+SIMPLE_SELECTOR = re.compile(r"^(?P<tag>[a-zA-Z][a-zA-Z0-9]*)?(?:#(?P<id>[\w-]+))?(?P<classes>(?:\.[\w-]+)*)$")
+
+
+class TargetStrainer(SoupStrainer):
+    """
+    Strainer that keeps only the subtrees rooted at target elements.
+
+    Targets are simple selectors: a tag name, an id and/or classes, as in
+    "div#chr-content", "span.chr-text", "#storycontent" or "h2".
+    """
+    def __init__(self, targets):
+        """
+        Compile the targets.
+
+        Raises:
+            ValueError: If a target is not a simple selector.
+        """
+        super().__init__()
+        self.targets = []
+        for target in targets:
+            match = SIMPLE_SELECTOR.match(target)
+            if not target or match is None:
+                raise ValueError(f"Unsupported target selector: {target}")
+            classes = set(filter(None, match.group("classes").split(".")))
+            self.targets.append((match.group("tag"), match.group("id"), classes))
+
+    def matches(self, name, attrs):
+        """
+        Tell whether a start tag opens a target subtree.
+
+        Args:
+            name (str): The tag name.
+            attrs (dict): The raw tag attributes.
+
+        Returns:
+            bool: True if the tag matches any target.
+        """
+        attrs = attrs or {}
+        for tag, id_, classes in self.targets:
+            if tag and tag != name:
+                continue
+            if id_ and attrs.get("id") != id_:
+                continue
+            if classes:
+                value = attrs.get("class") or ""
+                if isinstance(value, str):
+                    value = value.split()
+                if not classes.issubset(value):
+                    continue
+            return True
+        return False
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self.matches(name, attrs)
+
+    def allow_string_creation(self, string):
+        return False
+
+    def search_tag(self, markup_name=None, markup_attrs=None):
+        # Hook used by BeautifulSoup releases before 4.13.
+        return self.matches(markup_name, markup_attrs)
+
+
+def available_backends():
+    """
+    List the parser backends usable in this environment.
+
+    Returns:
+        list: Backend names accepted by parse().
+    """
+    backends = ["html.parser"]
+    if HAS_LXML:
+        backends.append("lxml")
+    if HAS_SELECTOLAX:
+        backends.append("selectolax")
+    return backends
+
+
+def resolve_backend(backend=None):
+    """
+    Turn a configured backend name into a usable one.
+
+    Args:
+        backend (str, optional): 'auto', 'html.parser', 'lxml' or
+            'selectolax'; defaults to PARSER_BACKEND.
+
+    Returns:
+        str: The backend name.
+
+    Raises:
+        ValueError: If the backend is unknown or not installed.
+    """
+    backend = backend or PARSER_BACKEND
+    if backend == "auto":
+        return "lxml" if HAS_LXML else "html.parser"
+    if backend not in available_backends():
+        raise ValueError(f"Parser backend '{backend}' is not available.")
+    return backend
+
+
+def parse(markup, backend=None, targets=None, required=()):
+    """
+    Parse an HTML document.
+
+    When targets are given only those subtrees are built. If any of the
+    required selectors then finds nothing, the page is parsed in full
+    instead, so an unexpected layout costs time rather than data.
+
+    Args:
+        markup (bytes | str): The document.
+        backend (str, optional): Backend name; see resolve_backend().
+        targets (iterable, optional): Simple selectors of the elements the
+            caller needs; see TargetStrainer. selectolax always builds the
+            whole tree.
+        required (iterable): CSS selectors that must match in the targeted
+            parse.
+
+    Returns:
+        Node: The document root.
+    """
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        return SelectolaxNode(LexborHTMLParser(markup))
+    if targets:
+        doc = SoupNode(BeautifulSoup(markup, backend, parse_only=TargetStrainer(targets)))
+        if all(doc.select_one(selector) is not None for selector in required):
+            return doc
+    return SoupNode(BeautifulSoup(markup, backend))
@@ -0,0 +1,156 @@
+"""
+Process-pool parsing stage decoupled from network fetching.
+
+Fetching runs on the fetch engine's event loop while the CPU-heavy parsing
+of each page runs in a ProcessPoolExecutor. Extractors are module-level
+functions taking the raw page bytes and returning plain, picklable data, so
+no parse tree ever crosses a process boundary. imap() keeps a bounded window
+of pages in flight, which bounds memory no matter how many URLs are queued
+and makes the fetchers wait when parsing falls behind.
+
+Workers are started from a forkserver (spawned where there is none) rather
+than forked from the scraping process, which already runs the engine loop,
+the fetch threads, the database pool and the session locks. A single small
+page is parsed inline, where the round trip to a worker would cost more
+than the parse.
+"""
+import asyncio
+import atexit
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from ..config.config import PARSE_INLINE_BYTES, PARSE_WINDOW, PARSE_WORKERS
+
+
+class ParsePipeline:
+    """
+    Run site extractors in worker processes.
+
+    Attributes:
+        workers (int): Number of worker processes; 0 parses in threads of
+            the current process instead.
+        window (int): Maximum number of pages fetched or parsed at once.
+        inline_bytes (int): extract() parses pages up to this size in the
+            calling thread.
+    """
+    def __init__(self, workers=PARSE_WORKERS, window=PARSE_WINDOW, inline_bytes=PARSE_INLINE_BYTES):
+        """Initialize the pipeline; worker processes start on first use."""
+        self.workers = workers
+        self.window = max(1, window)
+        self.inline_bytes = inline_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """ProcessPoolExecutor: The worker pool, or None when workers is 0."""
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(
+                        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                    ),
+                )
+            return self._executor
+
+    def extract(self, extractor, content, *args):
+        """
+        Run an extractor on one page and wait for the result.
+
+        Args:
+            extractor (callable): Module-level function called as
+                extractor(content, *args).
+            content (bytes): The raw page.
+            *args: Extra picklable arguments, e.g. the parser backend.
+
+        Returns:
+            object: The extractor's plain-data result.
+        """
+        if len(content) <= self.inline_bytes:
+            return extractor(content, *args)
+        executor = self.executor
+        if executor is None:
+            return extractor(content, *args)
+        return executor.submit(extractor, content, *args).result()
+
+    async def _fetch_extract(self, fetch, url, extractor, args):
+        """Fetch one page on the engine loop and hand it to a worker."""
+        content = await fetch(url)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(extractor, content, *args))
+
+    def imap(self, engine, fetch, urls, extractor, *args):
+        """
+        Fetch and extract many pages concurrently, yielding in input order.
+
+        At most `window` pages are being fetched, parsed or waiting to be
+        consumed at any time; the next URL is only scheduled once the
+        consumer takes a result.
+
+        Args:
+            engine (FetchEngine): Engine whose loop runs the fetches.
+            fetch (callable): Coroutine function fetch(url) -> bytes.
+            urls (iterable): URLs to process.
+            extractor (callable): Module-level function extractor(content, *args).
+            *args: Extra picklable arguments for the extractor.
+
+        Yields:
+            tuple: (url, result), where result is the extractor's return
+                value or the exception raised while fetching or extracting.
+        """
+        urls = iter(urls)
+        pending = deque()
+
+        def submit(url):
+            future = asyncio.run_coroutine_threadsafe(
+                self._fetch_extract(fetch, url, extractor, args), engine.loop
+            )
+            pending.append((url, future))
+
+        for url in islice(urls, self.window):
+            submit(url)
+        try:
+            while pending:
+                url, future = pending.popleft()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                next_url = next(urls, None)
+                if next_url is not None:
+                    submit(next_url)
+                yield url, result
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def close(self):
+        """Shut the worker processes down."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """
+    Return the process-wide parse pipeline.
+
+    Returns:
+        ParsePipeline: The shared pipeline; its workers stop at exit.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ParsePipeline()
+            atexit.register(_pipeline.close)
+        return _pipeline
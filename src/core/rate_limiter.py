@@ -0,0 +1,171 @@
+"""
+Adaptive per-host rate limiting.
+
+Each host gets a token bucket whose refill rate is tuned with AIMD
+(additive increase, multiplicative decrease): the rate creeps up while the
+host answers quickly with 2xx responses and is cut back as soon as it
+returns 429/503, fails outright, or its latency keeps growing. A single
+slow response is not enough: the median of the last few latencies has to
+stay well above the long-run average, and above an absolute floor.
+"""
+import asyncio
+import time
+from collections import deque
+
+from ..config.config import DEFAULT_RATE_POLICY, HOST_RATE_POLICIES
+
+
+class TokenBucket:
+    """
+    Token bucket with an AIMD-adjusted refill rate.
+
+    Attributes:
+        rate (float): Current refill rate in requests per second.
+        min_rate (float): Lower bound for rate.
+        max_rate (float): Upper bound for rate.
+        burst (float): Bucket capacity, i.e. the largest allowed burst.
+        increase (float): Amount added to rate after a fast 2xx response.
+        decrease (float): Factor applied to rate when the host pushes back.
+        latency_factor (float): Recent latencies whose median is above
+            latency_factor times the average latency count as push-back.
+        latency_floor (float): Median latency in seconds below which nothing
+            counts as slow.
+        latency_window (int): Number of recent latencies the median is taken over.
+        tokens (float): Tokens currently available.
+        latency (float): Slow exponentially weighted average response latency.
+        recent (deque): The latest latencies.
+    """
+    def __init__(self, rate, min_rate, max_rate, burst=1, increase=0.05,
+                 decrease=0.5, latency_factor=2.0, latency_floor=1.0, latency_window=5):
+        """Initialize a full bucket."""
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+
+        self.tokens = float(burst)
+        self.latency = None
+        self.recent = deque(maxlen=max(1, latency_window))
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._lock = None
+
+    def _refill(self):
+        """Add the tokens accumulated since the last refill."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def drain(self):
+        """Empty the bucket so the next request waits a full interval."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+    def record(self, status, latency):
+        """
+        Adjust the rate from the outcome of a request.
+
+        Args:
+            status (int): HTTP status code, or None if the request failed.
+            latency (float): Time taken by the request in seconds.
+        """
+        self.recent.append(latency)
+        self.latency = latency if self.latency is None else 0.95 * self.latency + 0.05 * latency
+
+        if status is None or status in (429, 503) or self._slowing():
+            self._back_off()
+        elif 200 <= status < 300:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def _slowing(self):
+        """Tell whether the recent latencies show a sustained slowdown."""
+        if len(self.recent) < self.recent.maxlen:
+            return False
+        median = sorted(self.recent)[len(self.recent) // 2]
+        return median > self.latency_floor and median > self.latency * self.latency_factor
+
+    def _back_off(self):
+        """Cut the rate, at most once per current request interval."""
+        now = time.monotonic()
+        if now - self._last_decrease < 1 / self.rate:
+            return
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.recent.clear()
+        self.drain()
+
+
+class RateLimiter:
+    """
+    Registry of token buckets keyed by host.
+
+    Attributes:
+        policies (dict): Bucket settings per host name.
+        default_policy (dict): Bucket settings for hosts without a policy.
+    """
+    def __init__(self, policies=None, default_policy=None):
+        """Initialize the limiter from the configured host policies."""
+        self.policies = dict(HOST_RATE_POLICIES)
+        if policies:
+            self.policies.update(policies)
+        self.default_policy = dict(default_policy or DEFAULT_RATE_POLICY)
+        self._buckets = {}
+
+    def bucket(self, host, rate=None):
+        """
+        Return the bucket for a host, creating it on first use.
+
+        Args:
+            host (str): The host name.
+            rate (float, optional): Starting rate for hosts without a policy.
+
+        Returns:
+            TokenBucket: The host's bucket.
+        """
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            policy = self.policies.get(host)
+            if policy is None:
+                policy = dict(self.default_policy)
+                if rate:
+                    policy["rate"] = min(max(rate, policy["min_rate"]), policy["max_rate"])
+            bucket = TokenBucket(**policy)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, host, rate=None):
+        """Wait for permission to send one request to host."""
+        await self.bucket(host, rate).acquire()
+
+    def record(self, host, status, latency):
+        """Feed the outcome of a request to host back into its bucket."""
+        self.bucket(host).record(status, latency)
+
+    def drain(self, host):
+        """Make the next request to host wait a full interval."""
+        self.bucket(host).drain()
+
+    def rates(self):
+        """
+        Return the current rate of every known host.
+
+        Returns:
+            dict: Requests per second keyed by host name.
+        """
+        return {host: bucket.rate for host, bucket in self._buckets.items()}
@@ -0,0 +1,217 @@
+"""
+Retry policy and circuit breaking for failed requests.
+
+Errors are classified as permanent (404/410, other client errors, or a page
+a scraper recognises as "not found") or transient (timeouts, connection
+errors, 408/429 and 5xx). Only transient errors are retried, with
+exponential backoff and full jitter, honouring Retry-After when the server
+sends it. A circuit breaker per host fails fast while a site keeps failing.
+"""
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from requests.exceptions import HTTPError
+
+from ..config.config import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    RETRY_AFTER_MAX,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+)
+
+
+class PermanentError(Exception):
+    """A request failed in a way that retrying cannot fix."""
+
+
+class CircuitOpenError(PermanentError):
+    """Requests to a host are suspended because it keeps failing."""
+
+
+class RetryError(Exception):
+    """All retry attempts for a request failed."""
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """
+    Decide whether and when a failed request is retried.
+
+    Attributes:
+        max_attempts (int): Total number of attempts per request.
+        base_delay (float): Backoff delay before the second attempt, in seconds.
+        max_delay (float): Upper bound for the backoff delay.
+        retry_after_max (float): Upper bound for a server-requested delay.
+    """
+    def __init__(self, max_attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY, retry_after_max=RETRY_AFTER_MAX):
+        """Initialize the policy from the configured defaults."""
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_after_max = retry_after_max
+
+    @staticmethod
+    def is_permanent(error):
+        """
+        Classify an error raised while fetching.
+
+        Args:
+            error (Exception): The error.
+
+        Returns:
+            bool: True if retrying cannot help.
+        """
+        if isinstance(error, PermanentError):
+            return True
+        if isinstance(error, HTTPError) and error.response is not None:
+            status = error.response.status_code
+            return 400 <= status < 500 and status not in (408, 429)
+        return False
+
+    def delay(self, attempt, error=None):
+        """
+        Return how long to wait before the next attempt.
+
+        Args:
+            attempt (int): Zero-based index of the attempt that just failed.
+            error (Exception, optional): The error it failed with.
+
+        Returns:
+            float: Seconds to wait.
+        """
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return min(retry_after, self.retry_after_max)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one host.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a trial
+            request is let through.
+        failures (int): Current number of consecutive failures.
+        opened_at (float): Monotonic time the circuit opened, or None.
+    """
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        """Initialize a closed circuit."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """str: 'closed', 'open' or 'half-open'."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def check(self, host=""):
+        """
+        Raise if requests should not be sent right now.
+
+        Args:
+            host (str): Host name used in the error message.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a
+                trial request already in flight.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return
+        raise CircuitOpenError(f"Circuit open for {host or 'host'}; skipping request.")
+
+    def record_success(self):
+        """Close the circuit after a successful request."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        """Count a transient failure, opening the circuit at the threshold."""
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class CircuitBreakers:
+    """Registry of circuit breakers keyed by host."""
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        """
+        Return the breaker for a host, creating it on first use.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            CircuitBreaker: The host's breaker.
+        """
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker()
+            return breaker
+
+    def states(self):
+        """
+        Return the state of every known host.
+
+        Returns:
+            dict: 'closed', 'open' or 'half-open' keyed by host name.
+        """
+        with self._lock:
+            return {host: breaker.state for host, breaker in self._breakers.items()}
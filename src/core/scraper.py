@@ -5,32 +5,60 @@ This module provides classes for scraping novels from different websites,
 including FanfictionNet and NovelBin. It handles fetching, parsing, and
 organizing chapter content into structured formats.
 """
-import cloudscraper
-from time import sleep
+import abc
+import asyncio
 
-class Scraper:
+from ..config.config import CONNECT_TIMEOUT, READ_TIMEOUT, STREAM_CHUNK_SIZE
+from .cache import get_cache
+from .cassette import get_cassette
+from .engine import get_engine, host_of
+from .parsers import parse, resolve_backend
+from .pipeline import get_pipeline
+from .retry import PermanentError, RetryError, RetryPolicy
+from .sessions import get_session_pool
+
+class Scraper(abc.ABC):
     """
     Base scraper class for fetching and parsing web content.
+
+    Site scrapers must implement iter_story and iter_updates; one that does
+    not cannot be instantiated.
     
     Attributes:
-        rate_limit (int): Delay in seconds between requests to avoid rate limiting.
-        parser (str): HTML parser to use with BeautifulSoup.
-        scraper: Cloudscraper instance for handling JavaScript-heavy sites.
-        retry_attempts (int): Number of retry attempts for failed requests.
+        rate_limit (int): Starting delay in seconds between requests for hosts
+            without a policy in HOST_RATE_POLICIES; the shared rate limiter
+            adapts it from there.
+        parser (str): HTML parser backend; see src/core/parsers.py.
+        sessions (SessionPool): Process-wide sessions keyed by host, each on a
+            plain or cloudscraper client.
+        retry_policy (RetryPolicy): Classifies errors and schedules retries.
+        timeout (tuple): (connect, read) timeouts in seconds.
+        engine (FetchEngine): Shared asynchronous engine that runs the requests.
+        cache (ResponseCache): Optional on-disk response cache.
+        cassette (Cassette): Optional record/replay archive. The cache is
+            bypassed while recording, so every page reaches the archive, and
+            while replaying.
+        replaying (bool): Whether responses come from the cassette. Replayed
+            requests skip the rate limiter and the circuit breakers, so the
+            only delay is the cassette's synthetic latency.
+        pipeline (ParsePipeline): Worker processes that run site extractors.
     """
-    def __init__(self, rate_limit=2):
+    def __init__(self, rate_limit=2, cache=None, cassette=None):
         """Initialize the base scraper with default settings."""
         self.rate_limit = rate_limit
-        self.parser = "html.parser"
-       
-        self.scraper = cloudscraper.create_scraper(
-            interpreter='js2py',
-            delay=5,            
-            browser="chrome",
-            debug=False
-        )
-        
-        self.retry_attempts = 3
+        self.parser = resolve_backend()
+        self.sessions = get_session_pool()
+        self.retry_policy = RetryPolicy()
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.engine = get_engine()
+        self.pipeline = get_pipeline()
+        self.cassette = cassette if cassette is not None else get_cassette()
+        self.replaying = bool(self.cassette and self.cassette.mode == "replay")
+        if self.cassette:
+            cache = None
+        elif cache is None:
+            cache = get_cache()
+        self.cache = cache
 
     def fetch(self, url):
         """
@@ -45,9 +73,50 @@ class Scraper:
         Raises:
             HTTPError: If the request returns an error status code.
         """
-        
-        response = self.scraper.get(url)
+        return self.engine.run(self.afetch(url))
+
+    async def afetch(self, url):
+        """
+        Fetch content from a given URL on the engine loop.
+
+        Fresh cached responses are returned without a request; stale ones
+        are revalidated with a conditional GET.
+
+        Args:
+            url (str): The URL to fetch.
+
+        Returns:
+            bytes: The response content.
+
+        Raises:
+            HTTPError: If the request returns an error status code.
+            PermanentError: If the page is a "not found" page.
+        """
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry is not None and entry["fresh"]:
+            content = self.cache.load(entry)
+            if content is not None:
+                return content
+            entry = None
+
+        transport = self.transport()
+        response = await self.engine.request(
+            url, transport, rate=1 / self.rate_limit, paced=not self.replaying, timeout=self.timeout,
+            headers=self.cache.validators(entry) if self.cache else None,
+        )
+        if entry is not None and response.status_code == 304:
+            content = self.cache.load(entry)
+            if content is not None:
+                self.cache.revalidated(url)
+                return content
+            response = await self.engine.request(
+                url, transport, rate=1 / self.rate_limit, paced=not self.replaying, timeout=self.timeout
+            )
         response.raise_for_status()
+        if self.is_not_found(response.content):
+            raise PermanentError(f"Page not found: {url}")
+        if self.cache:
+            self.cache.store(url, response.content, response.headers)
         return response.content
     
     def retry_fetch(self, url):
@@ -61,16 +130,288 @@ class Scraper:
             bytes: The response content.
             
         Raises:
-            Exception: If all retry attempts fail.
+            PermanentError: If the page does not exist or the host's circuit is open.
+            HTTPError: If the request fails with a permanent status code.
+            RetryError: If all retry attempts fail.
+        """
+        return self.engine.run(self.aretry_fetch(url))
+
+    async def aretry_fetch(self, url, fetch=None):
         """
-        for _ in range(self.retry_attempts):
+        Fetch content from a URL with retry logic on the engine loop.
+
+        Transient errors are retried with exponential backoff and jitter, or
+        after the server's Retry-After delay. Permanent errors are raised
+        immediately. The host's circuit breaker is left alone while
+        replaying a cassette.
+
+        Args:
+            url (str): The URL to fetch.
+            fetch (callable, optional): Coroutine function doing one attempt;
+                defaults to afetch.
+
+        Returns:
+            bytes: The response content, or whatever fetch returned.
+
+        Raises:
+            PermanentError: If the page does not exist or the host's circuit is open.
+            HTTPError: If the request fails with a permanent status code.
+            RetryError: If all retry attempts fail.
+        """
+        fetch = fetch or self.afetch
+        host = host_of(url)
+        breaker = None if self.replaying else self.engine.breakers.get(host)
+        for attempt in range(self.retry_policy.max_attempts):
+            if breaker:
+                breaker.check(host)
             try:
-                return self.fetch(url)
+                content = await fetch(url)
             except Exception as e:
-                print(f"Attempt failed: {e}")
-                sleep(self.rate_limit * 10)
-        raise Exception("Failed to fetch URL after multiple attempts.")
+                if self.retry_policy.is_permanent(e):
+                    if breaker:
+                        breaker.record_success()
+                    raise
+                if breaker:
+                    breaker.record_failure()
+                if attempt + 1 == self.retry_policy.max_attempts:
+                    raise RetryError(f"Failed to fetch {url} after multiple attempts: {e}") from e
+                delay = self.retry_policy.delay(attempt, e)
+                print(f"Attempt failed: {e}. Retrying in {delay:.1f}s")
+                if not self.replaying:
+                    self.engine.limiter.drain(host)
+                await asyncio.sleep(delay)
+            else:
+                if breaker:
+                    breaker.record_success()
+                return content
+
+    @abc.abstractmethod
+    def iter_story(self, target=None):
+        """
+        Start scraping a story, yielding its chapters lazily.
+
+        Args:
+            target: The site-specific story URL or ID; prompted for when None.
+
+        Returns:
+            StoryStream: The story, or None if the user exits.
+        """
+
+    def story(self, target=None):
+        """
+        Scrape an entire story.
+
+        Args:
+            target: The site-specific story URL or ID; prompted for when None.
+
+        Returns:
+            dict: Dictionary with 'metadata', 'chapters', 'id' and
+                'last_chapter_scraped' keys, or None if the user exits.
+        """
+        stream = self.iter_story(target)
+        if stream is None:
+            return None
+        return stream.to_dict()
+
+    @abc.abstractmethod
+    def iter_updates(self, *args):
+        """
+        Start fetching the chapters added since the last scrape, lazily.
+
+        Args:
+            *args: Site-specific position of the last scraped chapter.
+
+        Returns:
+            StoryStream: The new chapters.
+        """
+
+    def fingerprint(self, target):
+        """
+        Cheaply tell the current state of a story on the source.
+
+        Reads one small page, such as the story's stats or chapter list,
+        instead of any chapter. The page is kept so that an iter_updates
+        call for the same story right after does not fetch it again.
+
+        Args:
+            target: The story ID or chapter URL iter_updates takes first.
+
+        Returns:
+            str: A value that changes when chapters are added, or None if
+                the source cannot tell.
+        """
+        return None
+
+    def fetch_stream(self, url, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Fetch a URL and yield its body in chunks as it arrives.
+
+        The connection is opened with the usual retry logic, but the body is
+        never held in memory as a whole. A fresh cached copy is served from
+        the cache; streamed responses are not stored in it.
+
+        Args:
+            url (str): The URL to fetch.
+            chunk_size (int): Maximum size of each chunk in bytes.
+
+        Yields:
+            bytes: Consecutive chunks of the response body.
+        """
+        entry = self.cache.lookup(url) if self.cache else None
+        content = self.cache.load(entry) if entry is not None and entry["fresh"] else None
+        if content is not None:
+            for start in range(0, len(content), chunk_size):
+                yield content[start:start + chunk_size]
+            return
+
+        response = self.engine.run(self.aretry_fetch(url, self.aopen_stream))
+        try:
+            yield from response.iter_content(chunk_size)
+        finally:
+            response.close()
+
+    async def aopen_stream(self, url):
+        """
+        Send a streaming GET request on the engine loop.
+
+        Args:
+            url (str): The URL to fetch.
+
+        Returns:
+            requests.Response: The response, with the body not yet read.
+
+        Raises:
+            HTTPError: If the request returns an error status code.
+        """
+        response = await self.engine.request(
+            url, self.transport(), rate=1 / self.rate_limit, paced=not self.replaying,
+            timeout=self.timeout, stream=True,
+        )
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        return response
+
+    def parse(self, content, targets=None, required=()):
+        """
+        Parse a page with the configured backend.
+
+        Args:
+            content (bytes | str): The page.
+            targets (iterable, optional): Simple selectors of the only
+                subtrees to build; see parsers.parse().
+            required (iterable): CSS selectors that must match in the
+                targeted parse, or the page is parsed in full.
+
+        Returns:
+            Node: The document root, queried with CSS selectors.
+        """
+        return parse(content, self.parser, targets, required)
+
+    def extract(self, extractor, content):
+        """
+        Run a site extractor on a page in the parse worker pool.
+
+        Args:
+            extractor (callable): Module-level function called as
+                extractor(content, parser) that returns plain data.
+            content (bytes): The raw page.
+
+        Returns:
+            object: The extractor's result.
+        """
+        return self.pipeline.extract(extractor, content, self.parser)
+
+    def fetch_extract_many(self, urls, extractor):
+        """
+        Fetch many pages concurrently and extract each in the worker pool.
+
+        Args:
+            urls (iterable): The URLs to fetch.
+            extractor (callable): Module-level function called as
+                extractor(content, parser).
+
+        Yields:
+            tuple: (url, result) in input order, where result is the
+                extractor's return value or the exception that stopped it.
+        """
+        yield from self.pipeline.imap(
+            self.engine, self.aretry_fetch, urls, extractor, self.parser
+        )
+
+    def transport(self):
+        """
+        Return the blocking callable that performs a GET request.
+
+        Returns:
+            callable: A GET through the pooled client of the URL's host,
+                wrapped by the cassette if any.
+        """
+        if self.cassette:
+            return self.cassette.wrap(self.sessions.request)
+        return self.sessions.request
+
+    def is_not_found(self, content):
+        """
+        Tell whether a successful response is really a "not found" page.
+
+        Sites that answer missing pages with a 200 override this so the
+        miss is treated as permanent instead of being retried.
+
+        Args:
+            content (bytes): The response content.
+
+        Returns:
+            bool: True if the page does not exist.
+        """
+        return False
+
+    def fetch_many(self, urls, retry=True):
+        """
+        Fetch several URLs concurrently.
+
+        Requests to different hosts run in parallel; requests to the same
+        host are capped by the engine's per-host limit.
+
+        Args:
+            urls (iterable): The URLs to fetch.
+            retry (bool): Whether to apply the retry logic to each URL.
+
+        Returns:
+            list: The content of each URL in input order, or the exception
+                raised while fetching it.
+        """
+        return self.engine.run(self.afetch_many(urls, retry))
+
+    async def afetch_many(self, urls, retry=True):
+        """
+        Fetch several URLs concurrently on the engine loop.
+
+        Args:
+            urls (iterable): The URLs to fetch.
+            retry (bool): Whether to apply the retry logic to each URL.
+
+        Returns:
+            list: The content of each URL in input order, or the exception
+                raised while fetching it.
+        """
+        fetch = self.aretry_fetch if retry else self.afetch
+        return await asyncio.gather(
+            *(fetch(url) for url in urls), return_exceptions=True
+        )
     
+    @property
+    def scraper(self):
+        """requests.Session: The pooled session currently used for this site."""
+        return self.sessions.get(host_of(getattr(self, "base_url", "")))
+
     def close(self):
-        """Close the scraper session."""
-        self.scraper.close()
+        """
+        Persist the session cookies.
+
+        Sessions are shared with other scrapers, so they stay open until the
+        pool is closed at exit.
+        """
+        self.sessions.save()
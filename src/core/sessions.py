@@ -0,0 +1,324 @@
+"""
+Process-wide pool of HTTP sessions keyed by host.
+
+Each host starts on a plain pooled requests session. When a response turns
+out to be a Cloudflare challenge page the host is escalated to cloudscraper
+and the request is repeated; the decision is remembered for the rest of the
+run and saved to disk for the next one. Creating a cloudscraper session and
+solving a challenge with js2py is slow, so sessions are shared by every
+scraper in the process and their connection pools are sized for concurrent
+keep-alive reuse. Clearance cookies and the user agent they were issued for
+are persisted as well and restored until they expire.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import cloudscraper
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config.config import (
+    HOST_CLIENTS,
+    HOST_CONCURRENCY,
+    MAX_CONCURRENCY,
+    PLAIN_USER_AGENT,
+    SESSION_STATE_PATH,
+)
+from .engine import host_of
+
+PLAIN = "plain"
+CLOUDSCRAPER = "cloudscraper"
+
+# Byte patterns found in Cloudflare challenge pages.
+CHALLENGE_MARKERS = (b"cf-chl", b"cf_chl_opt", b"challenge-platform", b"<title>Just a moment")
+
+
+def is_challenge(response):
+    """
+    Tell whether a response is a Cloudflare challenge instead of the page.
+
+    Args:
+        response (requests.Response): The response to inspect.
+
+    Returns:
+        bool: True if the request must be repeated through cloudscraper.
+    """
+    if response.headers.get("cf-mitigated") == "challenge":
+        return True
+    if response.status_code not in (403, 429, 503):
+        return False
+    head = response.content[:4096]
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+class SessionPool:
+    """
+    Shared sessions with per-host client selection and persisted clearance.
+
+    Attributes:
+        state_path (str): JSON file holding client choice, cookies and user
+            agent per host.
+        state (dict): Persisted state keyed by host name.
+        counters (Counter): Requests per (host, client) plus escalations per
+            (host, 'escalated').
+    """
+    def __init__(self, state_path=SESSION_STATE_PATH):
+        """Initialize the pool and load the persisted state."""
+        self.state_path = state_path
+        self.state = {}
+        self.counters = Counter()
+        self._clients = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Read the persisted state, ignoring a missing or corrupt file."""
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def client(self, host):
+        """
+        Return the client used for a host.
+
+        Called with the pool lock held.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            str: 'plain' or 'cloudscraper'.
+        """
+        client = self._clients.get(host)
+        if client is None:
+            client = HOST_CLIENTS.get(host) or self.state.get(host, {}).get("client", PLAIN)
+            self._clients[host] = client
+        return client
+
+    def _size_pools(self, session, host):
+        """Size the session's connection pools for the host's concurrency."""
+        pool_size = max(HOST_CONCURRENCY.get(host, 1), 1)
+        for adapter in session.adapters.values():
+            adapter.init_poolmanager(MAX_CONCURRENCY, pool_size)
+
+    def _create(self, host, client):
+        """Create a session of the given kind for host."""
+        if client == PLAIN:
+            session = requests.Session()
+            session.headers["User-Agent"] = PLAIN_USER_AGENT
+            session.mount("https://", HTTPAdapter())
+            session.mount("http://", HTTPAdapter())
+            self._size_pools(session, host)
+            return session
+
+        session = cloudscraper.create_scraper(
+            interpreter='js2py',
+            delay=5,
+            browser="chrome",
+            debug=False
+        )
+        self._size_pools(session, host)
+
+        saved = self.state.get(host)
+        if saved:
+            now = time.time()
+            cookies = [c for c in saved.get("cookies", []) if c.get("expires") and c["expires"] > now]
+            if cookies and saved.get("user_agent"):
+                session.headers["User-Agent"] = saved["user_agent"]
+                for cookie in cookies:
+                    session.cookies.set(
+                        cookie["name"],
+                        cookie["value"],
+                        domain=cookie["domain"],
+                        path=cookie["path"],
+                        expires=cookie["expires"],
+                        secure=cookie.get("secure", False),
+                    )
+        return session
+
+    def get(self, host, client=None):
+        """
+        Return a session for a host, creating it on first use.
+
+        Args:
+            host (str): The host name.
+            client (str, optional): 'plain' or 'cloudscraper'; defaults to
+                the host's current client.
+
+        Returns:
+            requests.Session: The shared session.
+        """
+        with self._lock:
+            client = client or self.client(host)
+            session = self._sessions.get((host, client))
+            if session is None:
+                session = self._sessions[(host, client)] = self._create(host, client)
+            return session
+
+    def request(self, url, **kwargs):
+        """
+        Send a GET request through the right client for the URL's host.
+
+        A plain request answered with a challenge page escalates the host to
+        cloudscraper and is repeated there. The counters and the host's
+        client are only changed under the pool lock, as requests for the
+        same host run on several threads.
+
+        Args:
+            url (str): The URL to fetch.
+            **kwargs: Passed to Session.get (headers, timeout, ...).
+
+        Returns:
+            requests.Response: The response.
+        """
+        host = host_of(url)
+        with self._lock:
+            client = self.client(host)
+        response = self.get(host, client).get(url, **kwargs)
+        with self._lock:
+            self.counters[(host, client)] += 1
+        if client == PLAIN and is_challenge(response):
+            with self._lock:
+                if self._clients.get(host) != CLOUDSCRAPER:
+                    print(f"Challenge detected on {host}; switching to cloudscraper.")
+                    self._clients[host] = CLOUDSCRAPER
+                    self.counters[(host, "escalated")] += 1
+            response = self.get(host, CLOUDSCRAPER).get(url, **kwargs)
+            with self._lock:
+                self.counters[(host, CLOUDSCRAPER)] += 1
+        return response
+
+    def stats(self):
+        """
+        Summarise which client served each host.
+
+        Returns:
+            dict: {host: {'client', 'plain', 'cloudscraper', 'escalated'}}.
+        """
+        summary = {}
+        with self._lock:
+            for (host, kind), count in self.counters.items():
+                entry = summary.setdefault(
+                    host, {"client": self.client(host), PLAIN: 0, CLOUDSCRAPER: 0, "escalated": 0}
+                )
+                entry[kind] = count
+        return summary
+
+    def has_clearance(self, host):
+        """
+        Tell whether a host can skip the warm-up request.
+
+        Args:
+            host (str): The host name.
+
+        Returns:
+            bool: True if the host is known to work with the plain client,
+                or has unexpired persisted cloudscraper cookies.
+        """
+        saved = self.state.get(host, {})
+        with self._lock:
+            client = self.client(host)
+        if client == PLAIN:
+            return saved.get("client") == PLAIN
+        now = time.time()
+        return any(c.get("expires") and c["expires"] > now for c in saved.get("cookies", []))
+
+    def warm(self, urls):
+        """
+        Create sessions for several sites and settle their client up front.
+
+        Hosts with a known working client and valid clearance only get a
+        session; the others get one request each, run in parallel, which
+        also solves any challenge.
+
+        Args:
+            urls (iterable): One URL per site, usually the base URLs.
+        """
+        cold = []
+        for url in urls:
+            host = host_of(url)
+            self.get(host)
+            if not self.has_clearance(host):
+                cold.append(url)
+        if not cold:
+            return
+
+        def visit(url):
+            try:
+                self.request(url, timeout=30)
+            except Exception as e:
+                print(f"Failed to warm session for {url}: {e}")
+
+        with ThreadPoolExecutor(max_workers=len(cold)) as executor:
+            list(executor.map(visit, cold))
+        self.save()
+
+    def save(self):
+        """Persist the client choice, cookies and user agent of every host."""
+        if not self.state_path:
+            return
+        with self._lock:
+            for host, client in self._clients.items():
+                self.state.setdefault(host, {})["client"] = client
+            for (host, client), session in self._sessions.items():
+                if client != CLOUDSCRAPER:
+                    continue
+                cookies = [
+                    {
+                        "name": cookie.name,
+                        "value": cookie.value,
+                        "domain": cookie.domain,
+                        "path": cookie.path,
+                        "expires": cookie.expires,
+                        "secure": cookie.secure,
+                    }
+                    for cookie in session.cookies
+                    if cookie.expires
+                ]
+                if cookies:
+                    self.state[host].update(
+                        user_agent=session.headers.get("User-Agent"),
+                        cookies=cookies,
+                    )
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.state, f, indent=1)
+            os.replace(tmp_path, self.state_path)
+
+    def close(self):
+        """Persist the state and close every session."""
+        self.save()
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """
+    Return the process-wide session pool.
+
+    Returns:
+        SessionPool: The shared pool; it is saved and closed at exit.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SessionPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,100 @@
+"""
+Lazily scraped story.
+
+Scrapers return a StoryStream from iter_story() and iter_updates(): the
+metadata is available right away, and chapters are scraped only as the
+stream is iterated, so callers can persist them in batches while the scrape
+is still running instead of holding the whole novel in memory.
+"""
+from itertools import islice
+
+
+class StoryStream:
+    """
+    A story whose chapters are scraped on iteration.
+
+    Attributes:
+        metadata (dict): The story metadata.
+        chapters (iterator): Chapter records, produced as they are scraped.
+        id: The story ID on the source site, or None.
+        last_chapter_scraped (str): URL of the last chapter yielded so far,
+            for sources that resume from a chapter URL; otherwise None.
+        count (int): Number of chapters yielded so far.
+        fingerprint (str): The source fingerprint the update started from,
+            for streams of new chapters; see Scraper.fingerprint.
+        expected (int): Number of chapters the stream must yield to bring
+            the story up to that fingerprint, or None if it is not known.
+        finished (bool): Whether every chapter has been yielded.
+    """
+    def __init__(self, metadata=None, chapters=(), id=None, last_chapter_scraped=None,
+                 fingerprint=None, expected=None):
+        """Initialize the stream."""
+        self.metadata = metadata
+        self.chapters = chapters
+        self.id = id
+        self.last_chapter_scraped = last_chapter_scraped
+        self.count = 0
+        self.fingerprint = fingerprint
+        self.expected = expected
+        self.finished = False
+
+    def __iter__(self):
+        """Yield the chapters in order as they are scraped."""
+        for chapter in self.chapters:
+            self.count += 1
+            yield chapter
+        self.finished = True
+
+    def reached(self):
+        """
+        Return the fingerprint the story is at once the stream has been read.
+
+        Downloads stop quietly at the first chapter that fails, so the
+        fingerprint only counts as reached when every expected chapter was
+        yielded.
+
+        Returns:
+            str: The fingerprint, or None if the stream stopped short, has
+                not been read to the end, or has no fingerprint.
+        """
+        if self.finished and self.expected is not None and self.count >= self.expected:
+            return self.fingerprint
+        return None
+
+    def batches(self, size):
+        """
+        Yield the chapters in lists of at most size.
+
+        Args:
+            size (int): The batch size.
+
+        Yields:
+            list: Consecutive Chapter records.
+        """
+        chapters = iter(self)
+        while True:
+            batch = list(islice(chapters, size))
+            if not batch:
+                return
+            yield batch
+
+    def close(self):
+        """Stop scraping; chapters not yet yielded are never fetched."""
+        close = getattr(self.chapters, "close", None)
+        if close is not None:
+            close()
+
+    def to_dict(self):
+        """
+        Scrape the remaining chapters into the dictionary story() returns.
+
+        Returns:
+            dict: 'metadata', 'chapters', 'id' and 'last_chapter_scraped' keys.
+        """
+        chapters = list(self)
+        return {
+            "metadata": self.metadata,
+            "chapters": chapters,
+            "id": self.id,
+            "last_chapter_scraped": self.last_chapter_scraped,
+        }
@@ -0,0 +1,210 @@
+"""
+Process-wide PostgreSQL connection pool.
+
+Nothing connects at import time: the pool is created on first use from the
+DB_* environment variables and shared by every thread in the process. A
+connection that has been idle for a while is checked with SELECT 1 when it
+is checked out, and a broken one is discarded and replaced with a fresh
+connection, so a database restart or a dropped socket costs one reconnect
+instead of failing the run.
+"""
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+
+from ..config.config import DB_HEALTH_CHECK_INTERVAL, DB_POOL_MAX, DB_POOL_MIN
+
+load_dotenv()
+
+
+def connect_params():
+    """
+    Return the connection parameters from the environment.
+
+    Returns:
+        dict: Keyword arguments for psycopg2.connect.
+    """
+    return {
+        "host": os.getenv("DB_HOST"),
+        "database": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "port": os.getenv("DB_PORT"),
+    }
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of PostgreSQL connections.
+
+    Checking out blocks while all maxconn connections are in use instead of
+    raising, so any number of threads can share a small pool.
+    """
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, check_interval=DB_HEALTH_CHECK_INTERVAL):
+        """
+        Open the pool's first minconn connections.
+
+        Args:
+            minconn (int): Connections kept open while idle.
+            maxconn (int): Connections open at most.
+            check_interval (float): Idle seconds after which a connection
+                is checked before it is handed out.
+
+        Raises:
+            psycopg2.OperationalError: If the database cannot be reached.
+        """
+        self.maxconn = max(1, maxconn)
+        self.check_interval = check_interval
+        self._pool = ThreadedConnectionPool(min(minconn, self.maxconn), self.maxconn, **connect_params())
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def _healthy(self, conn):
+        """Return whether a pooled connection is still usable."""
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """
+        Check out a connection, waiting for one to be returned if needed.
+
+        Returns:
+            connection: A healthy connection; give it back with putconn.
+
+        Raises:
+            psycopg2.OperationalError: If no connection can be opened.
+        """
+        self._slots.acquire()
+        try:
+            conn = self._pool.getconn()
+            if not self._healthy(conn):
+                print("Database connection lost. Reconnecting...")
+                self._forget(conn)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+                if not self._healthy(conn):
+                    self._forget(conn)
+                    self._pool.putconn(conn, close=True)
+                    raise psycopg2.OperationalError("could not open a healthy database connection")
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        """
+        Return a connection to the pool.
+
+        Uncommitted work is rolled back. Broken connections, and those
+        returned with close=True, are closed instead of reused.
+
+        Args:
+            conn (connection): A connection from getconn.
+            close (bool, optional): Discard the connection. Defaults to False.
+        """
+        try:
+            if close or conn.closed:
+                self._forget(conn)
+                self._pool.putconn(conn, close=True)
+            else:
+                with self._lock:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def _forget(self, conn):
+        """Drop the bookkeeping of a connection that is being closed."""
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of a with block.
+
+        Work that was not committed when the block exits is rolled back. A
+        connection that failed at the network level is closed rather than
+        returned to the pool.
+
+        Yields:
+            connection: A healthy connection.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def close(self):
+        """Close every connection in the pool."""
+        if not self._pool.closed:
+            self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the process-wide connection pool, creating it on first use.
+
+    Returns:
+        ConnectionPool: The shared pool; it is closed at exit.
+
+    Raises:
+        psycopg2.OperationalError: If the pool has to be created and the
+            database cannot be reached; the next call tries again.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def connection():
+    """
+    Check out a pooled connection for the duration of a with block.
+
+        with connection() as conn, conn.cursor() as cursor:
+            cursor.execute(...)
+            conn.commit()
+
+    Returns:
+        contextmanager: See ConnectionPool.connection.
+    """
+    return get_pool().connection()
+
+
+def close_pool():
+    """Close the process-wide pool; the next call to get_pool opens a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
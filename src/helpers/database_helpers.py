@@ -1,60 +1,116 @@
-from dotenv import load_dotenv
-import os
-import psycopg2
-from datetime import datetime
+from psycopg2.extras import execute_values
+from datetime import datetime, timezone
+from itertools import islice
 import requests
 
-load_dotenv()
-
-def get_db_connection():
-    """Establish and return a connection to the PostgreSQL database."""
-    return psycopg2.connect(
-        host=os.getenv("DB_HOST"),
-        database=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        port=os.getenv("DB_PORT"),
-    )
-
-psql = get_db_connection()
-cursor = psql.cursor()
+from ..config.config import CHAPTER_BATCH_SIZE
+from .connection import close_pool, connection
 
 def close_db_connection():
-    """Close the database connection."""
-    cursor.close()
-    psql.close()
+    """Close the pooled database connections."""
+    close_pool()
 
-def add_novel(novel_data, last_chapter_href=None, fanficnet_id=None, ao3_id=None) -> int:
+def upsert_novel(psql, novel_data, last_chapter_href=None, fanficnet_id=None, ao3_id=None, novelbin_slug=None):
     """
-    Adds a novel to the database.
+    Inserts a novel, or refreshes the stored one, and returns its ID.
+
+    The novel is keyed on the first source ID given; its title, author,
+    description and resume point are refreshed when it is already stored,
+    the title only if no other novel has it. A new novel is inserted with
+    ON CONFLICT DO NOTHING, so a title clash never raises. A novel without
+    a source ID is then looked up by title. A novel whose title is already
+    stored on a row without any source ID (saved by older versions) gets
+    the ID attached to that row; a title stored for another source's novel
+    is reported and the novel is not stored. Nothing is rolled back, and
+    the caller commits.
     Args:
+        psql (connection): The connection to use.
         novel_data (dict): A dictionary containing novel metadata.
         last_chapter_href (str, optional): The href of the last chapter scraped. Defaults to None.
         fanficnet_id (str, optional): The FanFiction.net ID of the novel. Defaults to None.
         ao3_id (str, optional): The AO3 ID of the novel. Defaults to None.
+        novelbin_slug (str, optional): The NovelBin slug of the novel. Defaults to None.
     Returns:
-        int: The ID of the newly added novel.
+        tuple: The novel ID, or None if it could not be stored, and whether it was created.
     """
-    try:
-        insert_novel_query = "INSERT INTO novel_novel (title, creator, date, status, views, description, last_chapter_scraped, fanfic_id, ao3_id) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id"
-        
+    source_ids = {"fanfic_id": fanficnet_id, "ao3_id": ao3_id, "novelbin_slug": novelbin_slug}
+    source_ids = {column: str(value) for column, value in source_ids.items() if value is not None}
+    key = next(iter(source_ids), None)
+    title = novel_data["title"]
+    with psql.cursor() as cursor:
+        if key:
+            cursor.execute(
+                "UPDATE novel_novel n SET "
+                "title = CASE WHEN EXISTS (SELECT 1 FROM novel_novel o WHERE o.title = %s AND o.id <> n.id) "
+                "THEN n.title ELSE %s END, creator = %s, description = %s, "
+                "last_chapter_scraped = COALESCE(%s, n.last_chapter_scraped) "
+                f"WHERE {key} = %s RETURNING id",
+                (title, title, novel_data["author"], str(novel_data["description"]), last_chapter_href, source_ids[key])
+            )
+            row = cursor.fetchone()
+            if row:
+                return row[0], False
+
         cursor.execute(
-            insert_novel_query,
+            "INSERT INTO novel_novel (title, creator, date, status, views, description, last_chapter_scraped, fanfic_id, ao3_id, novelbin_slug) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) ON CONFLICT DO NOTHING RETURNING id",
             (
-                novel_data["title"],
+                title,
                 novel_data["author"],
-                datetime.today().strftime("%d %B %Y %H:%M"),
+                datetime.now(timezone.utc),
                 False,
                 0,
                 str(novel_data["description"]),
-                last_chapter_href, 
-                str(fanficnet_id),
-                str(ao3_id)
+                last_chapter_href,
+                source_ids.get("fanfic_id"),
+                source_ids.get("ao3_id"),
+                source_ids.get("novelbin_slug"),
             ),
         )
-        novel_id = cursor.fetchone()[0]
+        row = cursor.fetchone()
+        if row:
+            return row[0], True
+
+        if key:
+            # Stored meanwhile under the ID, or the title is taken: attach the
+            # ID to a legacy row stored under that title.
+            cursor.execute(f"SELECT id FROM novel_novel WHERE {key} = %s", (source_ids[key],))
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(
+                    f"UPDATE novel_novel SET {key} = %s WHERE title = %s "
+                    "AND fanfic_id IS NULL AND ao3_id IS NULL AND novelbin_slug IS NULL RETURNING id",
+                    (source_ids[key], title)
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    print(f"Novel '{title}' is already stored for another source. Not storing it.")
+        else:
+            cursor.execute("SELECT id FROM novel_novel WHERE title = %s", (title,))
+            row = cursor.fetchone()
+        return (row[0] if row else None), False
+
+def add_novel(novel_data, last_chapter_href=None, fanficnet_id=None, ao3_id=None, novelbin_slug=None) -> int:
+    """
+    Adds a novel to the database, or updates the stored one.
+    Args:
+        novel_data (dict): A dictionary containing novel metadata.
+        last_chapter_href (str, optional): The href of the last chapter scraped. Defaults to None.
+        fanficnet_id (str, optional): The FanFiction.net ID of the novel. Defaults to None.
+        ao3_id (str, optional): The AO3 ID of the novel. Defaults to None.
+        novelbin_slug (str, optional): The NovelBin slug of the novel. Defaults to None.
+    Returns:
+        int: The ID of the novel, or None if it could not be stored.
+    """
+    with connection() as psql, psql.cursor() as cursor:
+        novel_id, created = upsert_novel(psql, novel_data, last_chapter_href, fanficnet_id, ao3_id, novelbin_slug)
         psql.commit()
-        
+        if novel_id is None:
+            return None
+        if not created:
+            print(f"Novel '{novel_data['title']}' already exists in the database (ID: {novel_id}).")
+            return novel_id
+
         try:
             if novel_data["img_url"]:
                 with open(f"./media/novel-images/{novel_id}.jpg", "wb") as f:
@@ -66,48 +122,42 @@ def add_novel(novel_data, last_chapter_href=None, fanficnet_id=None, ao3_id=None
         except Exception as e:
             print(f"Failed to download or save image for novel '{novel_data['title']}': {e}")
 
-    except psycopg2.IntegrityError:
-        psql.rollback()
-        print(f"Novel '{novel_data['title']}' already exists in the database. Skipping insertion.")
-        cursor.execute("SELECT id FROM novel_novel WHERE title = %s", (novel_data["title"],))
-        result = cursor.fetchone()
-        if result:
-            novel_id = result[0]
-        else:
-            novel_id = None
-        
     return novel_id
 
 def add_chapter(novel_id, chapter_title, chapter_num, content):
     """
-    Adds a chapter to the database for a given novel.
+    Adds a chapter to the database for a given novel, or updates the stored one.
     Args:
         novel_id (int): The ID of the novel to which the chapter belongs.
         chapter_title (str): The title of the chapter.
         chapter_num (int): The chapter number.
         content (str): The content of the chapter.
     Returns:
-        None
+        int: The ID of the chapter, new or existing.
     """
-    try:
-        insert_chapter_query = "INSERT INTO novel_chapter (title, num, novel_id, content, date, views) VALUES (%s, %s, %s, %s, %s, %s) RETURNING id"
+    with connection() as psql, psql.cursor() as cursor:
         cursor.execute(
-            insert_chapter_query,
+            "INSERT INTO novel_chapter (title, num, novel_id, content, date, views) VALUES (%s, %s, %s, %s, %s, %s) "
+            "ON CONFLICT (novel_id, num) DO UPDATE SET title = EXCLUDED.title, content = EXCLUDED.content "
+            "RETURNING id, xmax = 0",
             (
                 chapter_title,
                 int(chapter_num),
                 novel_id,
                 str(content),
-                datetime.today().strftime("%d %B %Y %H:%M"),
+                datetime.now(timezone.utc),
                 0
             ),
         )
-        chapter_id = cursor.fetchone()[0]
-        print(f"Added chapter '{chapter_title}' (Chapter {chapter_num}) to novel ID {novel_id} with ID {chapter_id}")
+        chapter_id, created = cursor.fetchone()
+        if created:
+            record_chapters(cursor, novel_id, [int(chapter_num)])
         psql.commit()
-    except psycopg2.IntegrityError:
-        psql.rollback()
-        print(f"Chapter '{chapter_title}' (Chapter {chapter_num}) already exists for novel ID {novel_id}. Skipping insertion.")
+    if created:
+        print(f"Added chapter '{chapter_title}' (Chapter {chapter_num}) to novel ID {novel_id} with ID {chapter_id}")
+    else:
+        print(f"Updated chapter '{chapter_title}' (Chapter {chapter_num}) of novel ID {novel_id} (ID {chapter_id}).")
+    return chapter_id
 
 def update_novel_last_chapter(novel_id, last_chapter_href):
     """
@@ -116,48 +166,129 @@ def update_novel_last_chapter(novel_id, last_chapter_href):
         novel_id (int): The ID of the novel to update.
         last_chapter_href (str): The href of the last chapter scraped.
     """
+    with connection() as psql, psql.cursor() as cursor:
+        cursor.execute(
+            "UPDATE novel_novel SET last_chapter_scraped = %s WHERE id = %s",
+            (last_chapter_href, novel_id)
+        )
+        psql.commit()
+
+def record_chapters(cursor, novel_id, nums, last_chapter_href=None):
+    """
+    Updates a novel's chapter counters after chapters were added, without committing.
+    Args:
+        cursor (cursor): A cursor in the transaction that added the chapters.
+        novel_id (int): The ID of the novel.
+        nums (list): The numbers of the chapters that were added.
+        last_chapter_href (str, optional): The new resume point. Defaults to None.
+    """
     cursor.execute(
-        "UPDATE novel_novel SET last_chapter_scraped = %s WHERE id = %s",
-        (last_chapter_href, novel_id)
+        "UPDATE novel_novel SET chapter_count = chapter_count + %s, "
+        "max_chapter_num = GREATEST(max_chapter_num, %s), "
+        "last_chapter_at = CASE WHEN %s > 0 THEN now() ELSE last_chapter_at END, "
+        "last_chapter_scraped = COALESCE(%s, last_chapter_scraped) WHERE id = %s",
+        (len(nums), max(nums, default=0), len(nums), last_chapter_href, novel_id)
     )
-    psql.commit()
 
-def update_novels(novels, kwargs):
+def add_chapters_bulk(novel_id, chapters, batch_size=CHAPTER_BATCH_SIZE, conn=None, progress=None):
     """
-    Updates existing novels in the database by scraping new chapters.
+    Adds many chapters to the database with one multi-row INSERT and one commit per batch.
+
+    Chapters are upserted on (novel_id, num): a stored chapter is rewritten
+    only if its title or content changed, and counts as skipped. When
+    chapters is a StoryStream, it is consumed while it is scraped, and its
+    last_chapter_scraped is saved with each batch so an interrupted scrape
+    keeps its progress. The novel's chapter counters are updated in the
+    same transaction as the chapters.
     Args:
-        novels (list): A list of tuples containing novel ID, fanfic_id, and last_chapter_scraped.
+        novel_id (int): The ID of the novel the chapters belong to.
+        chapters (iterable): Chapter records, or a StoryStream.
+        batch_size (int, optional): Chapters per transaction. Defaults to CHAPTER_BATCH_SIZE.
+        conn (connection, optional): The connection to use. Defaults to one from the pool.
+        progress (callable, optional): Called as progress(inserted, skipped) after each batch.
+    Returns:
+        tuple: The number of chapters inserted and skipped.
     """
-    novelbin = kwargs.get("novelbin_instance", None)
-    fanficnet = kwargs.get("fanficnet_instance", None)
-    ao3 = kwargs.get("ao3_instance", None)
-    for title, novel_id, fanfic_id, last_chapter_scraped, ao3_id in novels:
-        print(f"Updating novel '{title}' (ID: {novel_id})...")
-        cursor.execute("SELECT MAX(num) FROM novel_chapter WHERE novel_id = %s", (novel_id,))
-        result = cursor.fetchone()
-        if result and result[0] is not None:
-            chapter_num = result[0]
-        else:
-            chapter_num = 0
+    if conn is None:
+        with connection() as conn:
+            return add_chapters_bulk(novel_id, chapters, batch_size, conn, progress)
+    chapters_iter = iter(chapters)
+    inserted = skipped = 0
+    with conn.cursor() as cur:
+        while True:
+            batch = list(islice(chapters_iter, batch_size))
+            if not batch:
+                break
+            date = datetime.now(timezone.utc)
+            # A row can only be upserted once per statement; the last copy wins.
+            values = {chapter.num: (chapter.title, chapter.num, novel_id, chapter.html, date, 0) for chapter in batch}
+            try:
+                rows = execute_values(
+                    cur,
+                    "INSERT INTO novel_chapter (title, num, novel_id, content, date, views) VALUES %s "
+                    "ON CONFLICT (novel_id, num) DO UPDATE SET title = EXCLUDED.title, content = EXCLUDED.content "
+                    "WHERE (novel_chapter.title, novel_chapter.content) IS DISTINCT FROM (EXCLUDED.title, EXCLUDED.content) "
+                    "RETURNING num, xmax = 0",
+                    list(values.values()),
+                    page_size=len(values),
+                    fetch=True,
+                )
+                created = [num for num, new in rows if new]
+                last_chapter_href = getattr(chapters, "last_chapter_scraped", None)
+                if created or last_chapter_href:
+                    record_chapters(cur, novel_id, created, last_chapter_href)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            inserted += len(created)
+            skipped += len(batch) - len(created)
+            print(
+                f"Saved chapters {batch[0].num}-{batch[-1].num} of novel ID {novel_id} "
+                f"({len(created)} new, {len(rows) - len(created)} updated)."
+            )
+            if progress:
+                progress(inserted, skipped)
+    return inserted, skipped
 
-        if fanfic_id and fanficnet:
-            chapters, fanficnet_id = fanficnet.update(fanfic_id, chapter_num)
+# Which stored novels can be updated from each source.
+UPDATE_SOURCES = {
+    "novelbin": "last_chapter_scraped IS NOT NULL AND last_chapter_scraped <> ''",
+    "fanficnet": "fanfic_id IS NOT NULL",
+    "ao3": "ao3_id IS NOT NULL",
+}
 
-        elif ao3_id and ao3:
-            chapters, ao3_idx = ao3.update(ao3_id, chapter_num)
-        elif last_chapter_scraped and novelbin:
-            chapters, last_chapter_scraped = novelbin.update(last_chapter_scraped, chapter_num)
-        else:
-            print(f"No valid source information for novel ID {novel_id}. Skipping update.")
-            continue
-        
-        if chapters:
-            if last_chapter_scraped:
-                update_novel_last_chapter(novel_id, last_chapter_scraped)
-            
-            for chapter_num, chapter_title, content in chapters:
-                add_chapter(novel_id, chapter_title, chapter_num, content)
-            print(f"Updated novel ID {novel_id} with {len(chapters)} new chapters.")
-        else:
-            print(f"No new chapters found for novel ID {novel_id}.")
-                 
\ No newline at end of file
+def load_update_candidates(source=None, ongoing_only=True, due_only=False, limit=None):
+    """
+    Loads the novels to check for new chapters, with their chapter counters, in one query.
+
+    Novels come most overdue first: never checked, then by how far past
+    their next check they are, relative to their check interval.
+    Args:
+        source (str, optional): Only novels that can be updated from this source
+            ('novelbin', 'fanficnet' or 'ao3'). Defaults to every novel.
+        ongoing_only (bool, optional): Leave out completed novels. Defaults to True.
+        due_only (bool, optional): Leave out novels whose next check is still to come.
+            Defaults to False.
+        limit (int, optional): Load at most this many novels. Defaults to all of them.
+    Returns:
+        list: Tuples of title, novel ID, fanfic_id, last_chapter_scraped, ao3_id, the
+            highest chapter number stored, when new chapters were last found, the
+            current check interval and the source fingerprint of the last check.
+    """
+    conditions = [UPDATE_SOURCES[source]] if source else []
+    if ongoing_only:
+        conditions.append("status = FALSE")
+    if due_only:
+        conditions.append("(next_check_at IS NULL OR next_check_at <= now())")
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    with connection() as psql, psql.cursor() as cursor:
+        cursor.execute(
+            "SELECT title, id, fanfic_id, last_chapter_scraped, ao3_id, max_chapter_num, last_chapter_at, check_interval, "
+            f"source_fingerprint FROM novel_novel {where}"
+            "ORDER BY next_check_at IS NOT NULL, "
+            "EXTRACT(EPOCH FROM now() - next_check_at) / GREATEST(EXTRACT(EPOCH FROM check_interval), 1) DESC, id "
+            "LIMIT %s",
+            (limit,)
+        )
+        return cursor.fetchall()
@@ -0,0 +1,343 @@
+"""
+Versioned schema migrations for the novel_novel and novel_chapter tables.
+
+Each migration has a version number, and schema_migrations records the
+versions applied to the database. migrate() applies the missing ones in
+order. A migration is either a tuple of statements, run in one transaction
+together with its schema_migrations row, or a function that takes the
+connection. Functions are used for changes that depend on the current
+column types, and for changes that rewrite whole tables, which they commit
+in batches so they do not hold long locks on a live database. Every
+migration can be re-run safely, so a database prepared by hand or
+interrupted halfway is brought to the same schema.
+
+An advisory lock keeps two processes from migrating at the same time.
+
+Migrating is an explicit step, run by create_database.py or
+`python main.py migrate`, since some migrations delete duplicate rows or
+lock whole tables. The applications only call check_schema() and refuse to
+start on an outdated database.
+"""
+import threading
+
+from ..config.config import MIGRATION_BATCH_SIZE
+from .connection import connection
+
+# Key of the advisory lock held while migrating.
+MIGRATION_LOCK = 7264110
+
+# Date format the scrapers used to store as text.
+TEXT_DATE_PATTERN = "^\\d{1,2} [A-Za-z]+ \\d{4} \\d{2}:\\d{2}$"
+TEXT_DATE_FORMAT = "DD FMMonth YYYY HH24:MI"
+
+
+def parse_text_date(column):
+    """Return SQL converting a text date column to timestamptz, or NULL if it does not parse."""
+    return f"CASE WHEN {column} ~ '{TEXT_DATE_PATTERN}' THEN to_timestamp({column}, '{TEXT_DATE_FORMAT}') END"
+
+
+def convert_dates(psql):
+    """
+    Convert the text date columns to timestamptz, online.
+
+    A timestamptz column is filled in batches of MIGRATION_BATCH_SIZE rows,
+    one transaction each, while the table stays writable. The table is only
+    locked for the final swap: rows added in the meantime are converted, the
+    text column is dropped and the new one takes its name.
+    Dates that do not parse become NULL.
+
+    Args:
+        psql (connection): The migrating connection.
+    """
+    with psql.cursor() as cursor:
+        for table in ("novel_novel", "novel_chapter"):
+            cursor.execute(
+                "SELECT data_type FROM information_schema.columns WHERE table_name = %s AND column_name = 'date'",
+                (table,)
+            )
+            row = cursor.fetchone()
+            if row is None or row[0] == "timestamp with time zone":
+                continue
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS date_tz TIMESTAMPTZ")
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            last_id = cursor.fetchone()[0]
+            psql.commit()
+
+            for start in range(0, last_id, MIGRATION_BATCH_SIZE):
+                cursor.execute(
+                    f"UPDATE {table} SET date_tz = {parse_text_date('date')} WHERE id > %s AND id <= %s",
+                    (start, start + MIGRATION_BATCH_SIZE)
+                )
+                psql.commit()
+                print(f"Converted {table} dates up to ID {min(start + MIGRATION_BATCH_SIZE, last_id)} of {last_id}.")
+
+            cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(f"UPDATE {table} SET date_tz = {parse_text_date('date')} WHERE id > %s", (last_id,))
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN date")
+            cursor.execute(f"ALTER TABLE {table} RENAME COLUMN date_tz TO date")
+            cursor.execute(f"ALTER TABLE {table} ALTER COLUMN date SET DEFAULT now()")
+            psql.commit()
+
+
+def chapter_counters(psql):
+    """
+    Add the per-novel chapter counters and fill them from the stored chapters.
+
+    Chapter dates are read as the text the scrapers used to store, or as
+    they are when the column already holds timestamps.
+
+    Args:
+        psql (connection): The migrating connection.
+    """
+    with psql.cursor() as cursor:
+        cursor.execute("ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS chapter_count INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS max_chapter_num INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS last_chapter_at TIMESTAMPTZ")
+        cursor.execute(
+            "SELECT data_type FROM information_schema.columns WHERE table_name = 'novel_chapter' AND column_name = 'date'"
+        )
+        row = cursor.fetchone()
+        if row is None:
+            chapter_date = "NULL::timestamptz"
+        elif row[0] in ("character varying", "text"):
+            chapter_date = parse_text_date("date")
+        else:
+            chapter_date = "date::timestamptz"
+        cursor.execute(
+            "UPDATE novel_novel n SET chapter_count = c.chapters, max_chapter_num = c.max_num, "
+            "last_chapter_at = COALESCE(n.last_chapter_at, c.last_at) FROM ("
+            "  SELECT novel_id, COUNT(*) AS chapters, COALESCE(MAX(num), 0) AS max_num,"
+            f"  MAX({chapter_date}) AS last_at"
+            "  FROM novel_chapter GROUP BY novel_id"
+            ") c WHERE n.id = c.novel_id"
+        )
+
+
+# Older versions stored a FanFiction.net or AO3 story's ID in both fanfic_id
+# and ao3_id. The real source is told by the resume URL or, failing that, by
+# the markup of the first stored chapter: FanFiction.net chapters are the
+# #storycontent element, AO3 chapters a div.userstuff. The other column is
+# cleared; rows with neither clue keep both IDs.
+SHARED_SOURCE_IDS = (
+    "UPDATE novel_novel n SET "
+    "fanfic_id = CASE WHEN s.source = 'fanficnet' THEN n.fanfic_id END, "
+    "ao3_id = CASE WHEN s.source = 'ao3' THEN n.ao3_id END "
+    "FROM ("
+    "  SELECT id, CASE"
+    "    WHEN last_chapter_scraped LIKE '%fanfiction.net%' THEN 'fanficnet'"
+    "    WHEN last_chapter_scraped LIKE '%archiveofourown.org%' THEN 'ao3'"
+    "    WHEN left(first_chapter, 300) LIKE '%storycontent%' THEN 'fanficnet'"
+    "    WHEN left(first_chapter, 300) LIKE '%userstuff%' THEN 'ao3'"
+    "  END AS source FROM ("
+    "    SELECT o.id, o.last_chapter_scraped, ("
+    "      SELECT c.content FROM novel_chapter c WHERE c.novel_id = o.id ORDER BY c.num LIMIT 1"
+    "    ) AS first_chapter FROM novel_novel o WHERE o.fanfic_id = o.ao3_id"
+    "  ) t"
+    ") s WHERE n.id = s.id AND s.source IS NOT NULL"
+)
+
+
+# (version, name, statements or batched function), in the order they apply.
+MIGRATIONS = (
+    (
+        1,
+        "base tables",
+        (
+            "CREATE TABLE IF NOT EXISTS novel_novel ("
+            "  id SERIAL PRIMARY KEY, title VARCHAR(255) NOT NULL UNIQUE, creator VARCHAR(255),"
+            "  date VARCHAR(100), status BOOLEAN NOT NULL DEFAULT FALSE, views INTEGER NOT NULL DEFAULT 0,"
+            "  description TEXT, last_chapter_scraped VARCHAR(500), fanfic_id VARCHAR(100),"
+            "  ao3_id VARCHAR(100), novel_image VARCHAR(255)"
+            ")",
+            "CREATE TABLE IF NOT EXISTS novel_chapter ("
+            "  id SERIAL PRIMARY KEY, title VARCHAR(500), num INTEGER NOT NULL,"
+            "  novel_id INTEGER NOT NULL REFERENCES novel_novel (id) ON DELETE CASCADE,"
+            "  content TEXT, date VARCHAR(100), views INTEGER NOT NULL DEFAULT 0"
+            ")",
+        ),
+    ),
+    (
+        2,
+        "source id keys",
+        (
+            "UPDATE novel_novel SET fanfic_id = NULL WHERE fanfic_id IN ('None', '')",
+            "UPDATE novel_novel n SET fanfic_id = NULL FROM novel_novel o "
+            "WHERE o.fanfic_id = n.fanfic_id AND o.id < n.id",
+            "CREATE UNIQUE INDEX IF NOT EXISTS novel_novel_fanfic_id_key ON novel_novel (fanfic_id) "
+            "WHERE fanfic_id IS NOT NULL",
+            "UPDATE novel_novel SET ao3_id = NULL WHERE ao3_id IN ('None', '')",
+            "UPDATE novel_novel n SET ao3_id = NULL FROM novel_novel o "
+            "WHERE o.ao3_id = n.ao3_id AND o.id < n.id",
+            "CREATE UNIQUE INDEX IF NOT EXISTS novel_novel_ao3_id_key ON novel_novel (ao3_id) "
+            "WHERE ao3_id IS NOT NULL",
+            "ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS novelbin_slug VARCHAR(255)",
+            "UPDATE novel_novel n SET novelbin_slug = s.slug FROM ("
+            "  SELECT DISTINCT ON (slug) id, slug FROM ("
+            "    SELECT id, substring(last_chapter_scraped from '/b/([^/?#]+)') AS slug FROM novel_novel"
+            "    WHERE fanfic_id IS NULL AND ao3_id IS NULL"
+            "  ) t WHERE slug IS NOT NULL ORDER BY slug, id"
+            ") s WHERE n.id = s.id AND n.novelbin_slug IS NULL "
+            "AND NOT EXISTS (SELECT 1 FROM novel_novel o WHERE o.novelbin_slug = s.slug)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS novel_novel_novelbin_slug_key ON novel_novel (novelbin_slug) "
+            "WHERE novelbin_slug IS NOT NULL",
+        ),
+    ),
+    (
+        3,
+        "unique chapter numbers",
+        (
+            "DELETE FROM novel_chapter a USING novel_chapter b "
+            "WHERE a.novel_id = b.novel_id AND a.num = b.num AND a.id > b.id",
+            "CREATE UNIQUE INDEX IF NOT EXISTS novel_chapter_novel_id_num_key ON novel_chapter (novel_id, num)",
+        ),
+    ),
+    (4, "chapter counters", chapter_counters),
+    (5, "timestamptz dates", convert_dates),
+    (
+        6,
+        "date indexes",
+        (
+            "CREATE INDEX IF NOT EXISTS novel_novel_date_idx ON novel_novel (date)",
+            "CREATE INDEX IF NOT EXISTS novel_chapter_date_idx ON novel_chapter (date)",
+        ),
+    ),
+    (
+        7,
+        "update schedule",
+        (
+            "ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS last_checked_at TIMESTAMPTZ",
+            "ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS check_interval INTERVAL NOT NULL DEFAULT '1 day'",
+            "ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS next_check_at TIMESTAMPTZ",
+            "CREATE INDEX IF NOT EXISTS novel_novel_next_check_at_idx ON novel_novel (next_check_at) "
+            "WHERE status = FALSE",
+        ),
+    ),
+    (
+        8,
+        "source fingerprints",
+        ("ALTER TABLE novel_novel ADD COLUMN IF NOT EXISTS source_fingerprint VARCHAR(500)",),
+    ),
+    (9, "shared source ids", (SHARED_SOURCE_IDS,)),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_migrated = False
+_migrated_lock = threading.Lock()
+
+
+class SchemaOutdatedError(RuntimeError):
+    """The database is missing migrations."""
+
+
+def applied_versions(cursor):
+    """
+    Return the versions recorded in schema_migrations, creating the table if needed.
+
+    Args:
+        cursor (cursor): A cursor on the migrating connection.
+
+    Returns:
+        set: The applied version numbers.
+    """
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "  version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL,"
+        "  applied_at TIMESTAMPTZ NOT NULL DEFAULT now()"
+        ")"
+    )
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {version for (version,) in cursor.fetchall()}
+
+
+def migrate(psql=None):
+    """
+    Apply the migrations the database is missing, once per process.
+
+    Args:
+        psql (connection, optional): The connection to migrate with. Defaults
+            to one from the pool.
+
+    Returns:
+        list: The versions applied by this call.
+    """
+    global _migrated
+    if psql is None:
+        with _migrated_lock:
+            if _migrated:
+                return []
+            with connection() as psql:
+                applied = migrate(psql)
+            _migrated = True
+            return applied
+
+    applied = []
+    with psql.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK,))
+        try:
+            done = applied_versions(cursor)
+            psql.commit()
+            for version, name, migration in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"Applying migration {version} ({name})...")
+                try:
+                    if callable(migration):
+                        migration(psql)
+                    else:
+                        for statement in migration:
+                            cursor.execute(statement)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name)
+                    )
+                    psql.commit()
+                except Exception:
+                    psql.rollback()
+                    raise
+                applied.append(version)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK,))
+            psql.commit()
+    return applied
+
+
+def pending_versions(psql):
+    """
+    Return the migrations the database is missing, without changing it.
+
+    Args:
+        psql (connection): The connection to check.
+
+    Returns:
+        list: The missing versions, in order.
+    """
+    with psql.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        done = set()
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {version for (version,) in cursor.fetchall()}
+    psql.rollback()
+    return [version for version, name, migration in MIGRATIONS if version not in done]
+
+
+def check_schema(psql=None):
+    """
+    Make sure the database schema is up to date.
+
+    Args:
+        psql (connection, optional): The connection to check. Defaults to
+            one from the pool.
+
+    Raises:
+        SchemaOutdatedError: If migrations are missing.
+    """
+    if psql is None:
+        with connection() as psql:
+            return check_schema(psql)
+    pending = pending_versions(psql)
+    if pending:
+        raise SchemaOutdatedError(
+            f"The database is missing schema migrations {', '.join(map(str, pending))} "
+            f"(expected schema version: {SCHEMA_VERSION}). Run `python main.py migrate` or create_database.py first."
+        )
@@ -0,0 +1,87 @@
+"""
+Adaptive update schedule for stored novels.
+
+Every check of a novel is recorded in novel_novel: last_checked_at, the
+check_interval learned so far and the next_check_at it gives. A check that
+finds new chapters sets the interval from the observed time per new chapter
+since last_chapter_at, when new chapters were found before, averaged with
+the interval before. It never lengthens the interval, as last_chapter_at
+is seeded from chapter dates that may predate the schedule by years. A
+quiet check backs off exponentially, up to UPDATE_MAX_INTERVAL_HOURS, but
+never past the time since last_chapter_at, so a novel that just got new
+chapters keeps being checked at its pace, abandoned novels are soon
+checked about once a month and daily ones every few hours. Update runs
+only load the novels that are due.
+
+A check also stores the source fingerprint the novel's chapters are up to
+date with, so the next check can tell from it alone that nothing changed.
+"""
+from datetime import datetime, timedelta, timezone
+
+from ..config.config import UPDATE_BACKOFF, UPDATE_MAX_INTERVAL_HOURS, UPDATE_MIN_INTERVAL_HOURS
+from .connection import connection
+
+MIN_INTERVAL = timedelta(hours=UPDATE_MIN_INTERVAL_HOURS)
+MAX_INTERVAL = timedelta(hours=UPDATE_MAX_INTERVAL_HOURS)
+
+
+def next_interval(interval, inserted, last_chapter_at, now):
+    """
+    Compute a novel's check interval after a successful check.
+
+    Args:
+        interval (timedelta): The interval before the check.
+        inserted (int): New chapters the check found.
+        last_chapter_at (datetime): When new chapters were found before
+            this check, or None.
+        now (datetime): When the check finished.
+
+    Returns:
+        timedelta: The new interval, between MIN_INTERVAL and MAX_INTERVAL.
+    """
+    interval = interval or MIN_INTERVAL
+    if inserted:
+        if last_chapter_at is not None:
+            observed = (now - last_chapter_at) / inserted
+            interval = min(interval, (interval + observed) / 2)
+        else:
+            interval = MIN_INTERVAL
+    elif last_chapter_at is not None:
+        interval = max(interval, min(interval * UPDATE_BACKOFF, now - last_chapter_at))
+    else:
+        interval = interval * UPDATE_BACKOFF
+    return min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+
+def record_check(novel, inserted, error=None, fingerprint=None):
+    """
+    Record a check of a novel and schedule the next one.
+
+    A failed check keeps the interval and is retried after MIN_INTERVAL.
+
+    Args:
+        novel (tuple): The novel's row from load_update_candidates.
+        inserted (int): New chapters the check found.
+        error (Exception, optional): Why the check failed. Defaults to None.
+        fingerprint (str, optional): The source fingerprint the stored chapters
+            are now up to date with. Defaults to None, which keeps the stored one.
+
+    Returns:
+        datetime: When the novel is next due.
+    """
+    title, novel_id, fanfic_id, last_chapter_scraped, ao3_id, chapter_num, last_chapter_at, interval, stored = novel
+    now = datetime.now(timezone.utc)
+    with connection() as psql, psql.cursor() as cursor:
+        if error is not None:
+            next_check_at = now + MIN_INTERVAL
+            cursor.execute("UPDATE novel_novel SET next_check_at = %s WHERE id = %s", (next_check_at, novel_id))
+        else:
+            interval = next_interval(interval, inserted, last_chapter_at, now)
+            next_check_at = now + interval
+            cursor.execute(
+                "UPDATE novel_novel SET last_checked_at = %s, check_interval = %s, next_check_at = %s, "
+                "source_fingerprint = COALESCE(%s, source_fingerprint) WHERE id = %s",
+                (now, interval, next_check_at, fingerprint, novel_id)
+            )
+        psql.commit()
+    return next_check_at
@@ -0,0 +1,214 @@
+"""
+Concurrent update runs over many stored novels.
+
+A run checks the candidate novels on a bounded pool of worker threads. Each
+source gets at most host_workers of them at a time, and a free worker always
+takes the next novel from the source with the fewest novels in flight, so
+while one host is waiting on its rate limit the others keep being checked.
+Every novel is saved in its own transactions, and an error only fails the
+novel it happened on. Each check is recorded in the novel's update schedule;
+see src/helpers/scheduler.py.
+
+A check starts with the scraper's fingerprint() of the novel, read from one
+small page. When it matches the fingerprint stored by the last check, the
+novel has not changed on its source and no chapters are fetched.
+"""
+import queue
+import threading
+from collections import deque
+
+from ..config.config import UPDATE_HOST_WORKERS, UPDATE_WORKERS
+from .database_helpers import add_chapters_bulk
+from .scheduler import record_check
+
+
+def novel_source(novel, sources, source=None):
+    """
+    Pick the source a novel is updated from.
+
+    Args:
+        novel (tuple): A row from load_update_candidates.
+        sources (iterable): The sources scrapers are available for.
+        source (str, optional): The source the novel was loaded for. Defaults
+            to None, which picks one from the novel's source columns.
+
+    Returns:
+        str: 'fanficnet', 'ao3' or 'novelbin', or None if the novel cannot be
+            updated from any of the sources.
+    """
+    title, novel_id, fanfic_id, last_chapter_scraped, ao3_id = novel[:5]
+    if source is not None:
+        targets = {"fanficnet": fanfic_id, "ao3": ao3_id, "novelbin": last_chapter_scraped}
+        return source if targets.get(source) and source in sources else None
+    if fanfic_id and "fanficnet" in sources:
+        return "fanficnet"
+    if ao3_id and "ao3" in sources:
+        return "ao3"
+    if last_chapter_scraped and "novelbin" in sources:
+        return "novelbin"
+    return None
+
+
+class UpdateRunner:
+    """
+    Check stored novels for new chapters on a pool of worker threads.
+
+    Attributes:
+        scrapers (dict): Source name to a callable returning a scraper. Each
+            worker builds its own scrapers, since a scraper may keep state
+            for the story it is fetching.
+        workers (int): Novels checked at once.
+        host_workers (int): Novels checked at once on the same source.
+    """
+    def __init__(self, scrapers, workers=UPDATE_WORKERS, host_workers=UPDATE_HOST_WORKERS):
+        """Initialize the runner."""
+        self.scrapers = scrapers
+        self.workers = max(1, workers)
+        self.host_workers = max(1, host_workers)
+
+    def run(self, novels, source=None):
+        """
+        Update the novels, yielding each result as its novel finishes.
+
+        Results are yielded in the calling thread, so callers can report
+        progress from it. Closing the generator early lets the novels in
+        flight finish and skips the rest.
+
+        Args:
+            novels (list): Rows from load_update_candidates.
+            source (str, optional): The source the novels were loaded for,
+                which they are all updated from. Defaults to None, which
+                picks each novel's source from its source columns.
+
+        Yields:
+            dict: 'novel_id', 'title', 'source', 'inserted', 'skipped',
+                'unchanged' (whether the fingerprint matched) and 'error' (the
+                exception, or None) of one novel.
+        """
+        pending = {}
+        for novel in novels:
+            novel_from = novel_source(novel, self.scrapers, source)
+            if novel_from is None:
+                print(f"No valid source information for novel ID {novel[1]}. Skipping update.")
+                yield self._result(novel, None, error=ValueError("no source to update from"))
+                continue
+            pending.setdefault(novel_from, deque()).append(novel)
+
+        total = sum(len(queued) for queued in pending.values())
+        if not total:
+            return
+        active = dict.fromkeys(pending, 0)
+        condition = threading.Condition()
+        results = queue.Queue()
+        stopped = threading.Event()
+
+        def next_novel():
+            """Wait for a novel a worker may take; None once there are no more."""
+            with condition:
+                while True:
+                    if stopped.is_set():
+                        return None
+                    ready = [source for source, queued in pending.items() if queued and active[source] < self.host_workers]
+                    if ready:
+                        source = min(ready, key=lambda source: active[source])
+                        active[source] += 1
+                        return source, pending[source].popleft()
+                    if not any(pending.values()):
+                        return None
+                    condition.wait()
+
+        def worker():
+            scrapers = {}
+            while True:
+                task = next_novel()
+                if task is None:
+                    return
+                source, novel = task
+                try:
+                    if source not in scrapers:
+                        scrapers[source] = self.scrapers[source]()
+                    result = self.update(scrapers[source], source, novel)
+                except Exception as e:
+                    print(f"Error updating novel '{novel[0]}' (ID: {novel[1]}): {e}")
+                    result = self._result(novel, source, error=e)
+                with condition:
+                    active[source] -= 1
+                    condition.notify_all()
+                results.put(result)
+
+        threads = [
+            threading.Thread(target=worker, name=f"update-{n}", daemon=True)
+            for n in range(min(self.workers, total))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for _ in range(total):
+                yield results.get()
+        finally:
+            with condition:
+                stopped.set()
+                condition.notify_all()
+            for thread in threads:
+                thread.join()
+
+    def update(self, scraper, source, novel):
+        """
+        Fetch and save the new chapters of one novel, unless it is unchanged.
+
+        A novel whose fingerprint cannot be read is checked in full.
+
+        Args:
+            scraper (Scraper): The worker's scraper for the novel's source.
+            source (str): The novel's source.
+            novel (tuple): A row from load_update_candidates.
+
+        Returns:
+            dict: The novel's result; see run().
+        """
+        title, novel_id, fanfic_id, last_chapter_scraped, ao3_id, chapter_num = novel[:6]
+        stored_fingerprint = novel[8]
+        target = {"fanficnet": fanfic_id, "ao3": ao3_id}.get(source, last_chapter_scraped)
+        print(f"Updating novel '{title}' (ID: {novel_id}) from {source}...")
+        try:
+            fingerprint = scraper.fingerprint(target)
+        except Exception as e:
+            print(f"Could not fingerprint novel ID {novel_id}: {e}. Checking its chapters.")
+            fingerprint = None
+        if fingerprint is not None and fingerprint == stored_fingerprint:
+            next_check_at = record_check(novel, 0)
+            print(f"Novel ID {novel_id} is unchanged on {source}.")
+            print(f"Next check of novel ID {novel_id}: {next_check_at:%Y-%m-%d %H:%M} UTC.")
+            return self._result(novel, source, unchanged=True)
+
+        stream = None
+        try:
+            stream = scraper.iter_updates(target, chapter_num)
+            inserted, skipped = add_chapters_bulk(novel_id, stream)
+        except Exception as e:
+            if stream is not None:
+                stream.close()
+            print(f"Error updating novel '{title}' (ID: {novel_id}): {e}")
+            record_check(novel, 0, e)
+            return self._result(novel, source, error=e)
+
+        next_check_at = record_check(novel, inserted, fingerprint=stream.reached())
+        if inserted or skipped:
+            print(f"Updated novel ID {novel_id} with {inserted} new chapters ({skipped} already stored).")
+        else:
+            print(f"No new chapters found for novel ID {novel_id}.")
+        print(f"Next check of novel ID {novel_id}: {next_check_at:%Y-%m-%d %H:%M} UTC.")
+        return self._result(novel, source, inserted, skipped)
+
+    @staticmethod
+    def _result(novel, source, inserted=0, skipped=0, unchanged=False, error=None):
+        """Build the result of one novel."""
+        return {
+            "novel_id": novel[1],
+            "title": novel[0],
+            "source": source,
+            "inserted": inserted,
+            "skipped": skipped,
+            "unchanged": unchanged,
+            "error": error,
+        }